@@ -1,9 +1,9 @@
 from django.contrib import admin
-from api.models import Certificate, CompletedLesson, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, EnrolledCourse, Review, Notification, Coupon, Wishlist, Country, Question_Answer, Question_Answer_Message, Note
+from api.models import Certificate, CompletedLesson, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, EnrolledCourse, Review, Notification, Coupon, Wishlist, Country, Question_Answer, Question_Answer_Message, Note, MediaJob, MediaBlob, ChunkedUpload
 
 
 class CourseAdmin(admin.ModelAdmin):
-    list_editable = ['title', 'image', 'price', 'level', 'language',  'platform_status', 'teacher_course_status', 'featured', 'rating', 'course_id',]
+    list_editable = ['title', 'image', 'price', 'level', 'language',  'platform_status', 'teacher_course_status', 'featured', 'course_id',]
     list_display = [ 'thumbnail', 'title', 'image', 'price', 'teacher', 'level', 'language', 'category', 'platform_status', 'teacher_course_status', 'featured', 'rating', 'course_id',]
     
 class VariantAdmin(admin.ModelAdmin):
@@ -11,7 +11,7 @@ class VariantAdmin(admin.ModelAdmin):
 
     
 class VariantItemAdmin(admin.ModelAdmin):
-    list_display = [ 'variant', 'title', 'file', 'content_duration', 'preview', 'variant_item_id']
+    list_display = [ 'variant', 'title', 'file', 'content_duration', 'media_status', 'preview', 'variant_item_id']
     list_editable = ['file', 'preview']
 
 class CartOrderAdmin(admin.ModelAdmin):
@@ -24,6 +24,21 @@ class CartOrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'total', 'date']
 
 
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'content_type', 'object_id', 'status', 'attempts', 'run_after', 'date']
+    list_filter = ['kind', 'status']
+
+
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['file', 'size', 'refcount', 'date']
+    readonly_fields = ['sha256', 'file', 'size', 'refcount', 'info', 'date']
+
+
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'variant_item', 'user', 'offset', 'size', 'status', 'updated_at']
+    list_filter = ['status']
+
+
 class EnrolledCourseAdmin(admin.ModelAdmin):
     list_display = [ 'course', 'user', 'teacher', 'order_item', 'date',]
     list_editable = [ 'user']
@@ -50,3 +65,6 @@ admin.site.register(Question_Answer)
 admin.site.register(Question_Answer_Message)
 admin.site.register(Note)
 
+admin.site.register(MediaJob, MediaJobAdmin)
+admin.site.register(MediaBlob, MediaBlobAdmin)
+admin.site.register(ChunkedUpload, ChunkedUploadAdmin)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connects the receivers that keep the search index and the catalog
+        # cache in sync.
+        from api import cache, search  # noqa: F401
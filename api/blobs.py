@@ -0,0 +1,104 @@
+"""
+Content addressing for uploaded media.
+
+Uploads are hashed (SHA-256) while Django receives them, by the upload
+handlers below (FILE_UPLOAD_HANDLERS), and stored once per hash as a
+MediaBlob (api/models.py). A file whose hash is already stored is linked
+to the existing copy instead of being written again, and the blob keeps
+what the media worker learned about it (duration, HLS renditions) so a
+re-upload isn't probed or transcoded again.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import transaction
+
+
+DIRECTORY = "blobs"
+
+
+def blob_name(sha256, filename):
+    """The storage name of the content with this hash, e.g. blobs/3f/3f9a...c2.mp4."""
+    return f"{DIRECTORY}/{sha256[:2]}/{sha256}{os.path.splitext(filename)[1].lower()}"
+
+
+def sha256_of(file):
+    """The hex SHA-256 of `file`: from the upload handler if it hashed it, else read once."""
+    digest = getattr(file, "sha256", None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        file.seek(0)
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+    file.seek(0)
+    return digest
+
+
+_written = threading.local()
+
+
+def written(storage, name):
+    """Called by MediaBlob.store() for each file it writes to storage."""
+    names = getattr(_written, "names", None)
+    if names is not None:
+        names.append((storage, name))
+
+
+@contextmanager
+def atomic():
+    """
+    transaction.atomic() that also deletes the blob files written inside
+    it if it rolls back. Their MediaBlob rows are rolled back with it, so
+    nothing would ever count or delete them.
+    """
+    outer = getattr(_written, "names", None)
+    _written.names = names = []
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        from api.models import MediaBlob
+
+        for storage, name in names:
+            # Unless another request has stored the same content since.
+            if not MediaBlob.objects.filter(file=name).exists():
+                storage.delete(name)
+        raise
+    else:
+        if outer is not None:
+            outer.extend(names)
+    finally:
+        _written.names = outer
+
+
+class HashingMixin:
+    """Hash each chunk as it is received and set `sha256` on the finished file."""
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler raises StopFutureHandlers.
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes large files on to the next handler untouched.
+        if getattr(self, "activated", True):
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
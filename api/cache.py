@@ -0,0 +1,159 @@
+"""
+Response cache for the public catalog endpoints.
+
+Rendered responses are cached per absolute URL (query string included) and
+accepted media type. Every entry is stored under a key that also includes the current
+version of each of its tags, e.g. "courses" or "course:42". Invalidating a
+tag bumps its version, so every entry built from the old version simply stops
+being looked up and ages out on its own; nothing has to track which keys
+belong to which tag.
+
+Tags are bumped from the model receivers at the bottom of this module, after
+the surrounding transaction commits. Use a shared backend (Redis) when
+running more than one process: with the local-memory default each process
+has its own cache and its own tag versions.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from api.models import (
+    Category, CompletedLesson, Course, EnrolledCourse, Note, Question_Answer, Question_Answer_Message,
+    Review, Teacher, Variant, VariantItem,
+)
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _tag_key(tag):
+    return f"catalog:tag:{tag}"
+
+
+def _new_version():
+    # Time-based rather than counting from 1, so a tag evicted from the cache
+    # can never come back at a version that old entries were stored under.
+    return time.time_ns()
+
+
+def tag_versions(tags):
+    cache = get_cache()
+    keys = {tag: _tag_key(tag) for tag in tags}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for tag, key in keys.items():
+        if key not in stored:
+            cache.add(key, _new_version(), timeout=None)
+            stored[key] = cache.get(key)
+        versions[tag] = stored[key]
+    return versions
+
+
+def invalidate(*tags):
+    get_cache().set_many({_tag_key(tag): _new_version() for tag in tags}, timeout=None)
+
+
+def course_tag(course_id):
+    return f"course:{course_id}"
+
+
+def response_cache_key(request, tags):
+    versions = tag_versions(tags)
+    parts = [request.build_absolute_uri(), request.accepted_media_type or ""]
+    parts += [f"{tag}={versions[tag]}" for tag in sorted(versions)]
+    return "catalog:response:" + hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Serve GET requests from the catalog cache.
+
+    Views set `cache_tags` or override `get_cache_tags()`. Only 200 responses
+    are stored, once they have been rendered.
+    """
+    cache_tags = ()
+
+    def get_cache_tags(self):
+        return self.cache_tags
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_cache_key(request, self.get_cache_tags())
+        response = cache.get(key)
+        if response is not None:
+            # Validators belong to the current request (see the condition()
+            # decorated views), not to the one that filled the cache.
+            for header in ('ETag', 'Last-Modified'):
+                if response.has_header(header):
+                    del response[header]
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: cache.set(key, rendered, settings.CATALOG_CACHE_TIMEOUT))
+        return response
+
+
+def _invalidate_on_commit(*tags):
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def _course_changed(sender, instance, **kwargs):
+    _invalidate_on_commit("courses", course_tag(instance.pk))
+
+
+def _course_part_changed(sender, instance, **kwargs):
+    # Rows nested in the course detail payload.
+    if instance.course_id:
+        _invalidate_on_commit(course_tag(instance.course_id))
+
+
+def _review_changed(sender, instance, **kwargs):
+    # Reviews also move the rating shown on catalog cards.
+    if instance.course_id:
+        _invalidate_on_commit("courses", course_tag(instance.course_id))
+
+
+def _lecture_changed(sender, instance, **kwargs):
+    # Callers that created or loaded the lecture through its section have
+    # it cached; only a bare lecture costs a query.
+    if VariantItem.variant.is_cached(instance):
+        course_id = instance.variant.course_id
+    else:
+        course_id = Variant.objects.filter(pk=instance.variant_id).values_list("course_id", flat=True).first()
+    if course_id:
+        _invalidate_on_commit(course_tag(course_id))
+
+
+def _category_changed(sender, instance, **kwargs):
+    course_ids = Course.objects.filter(category=instance).values_list("pk", flat=True)
+    _invalidate_on_commit("categories", "courses", *[course_tag(course_id) for course_id in course_ids])
+
+
+def _teacher_changed(sender, instance, **kwargs):
+    course_ids = Course.objects.filter(teacher=instance).values_list("pk", flat=True)
+    _invalidate_on_commit("courses", *[course_tag(course_id) for course_id in course_ids])
+
+
+RECEIVERS = {
+    Course: _course_changed,
+    Variant: _course_part_changed,
+    VariantItem: _lecture_changed,
+    Review: _review_changed,
+    EnrolledCourse: _course_part_changed,
+    CompletedLesson: _course_part_changed,
+    Note: _course_part_changed,
+    Question_Answer: _course_part_changed,
+    Question_Answer_Message: _course_part_changed,
+    Category: _category_changed,
+    Teacher: _teacher_changed,
+}
+
+for model, handler in RECEIVERS.items():
+    post_save.connect(handler, sender=model, dispatch_uid=f"catalog_cache_save_{model.__name__}")
+    post_delete.connect(handler, sender=model, dispatch_uid=f"catalog_cache_delete_{model.__name__}")
@@ -0,0 +1,383 @@
+"""
+Writing a course's sections and lectures (Variant / VariantItem) in bulk.
+
+`create_curriculum` inserts a new course's curriculum; `update_curriculum`
+diffs a submitted curriculum against the stored one and writes only the
+differences; `apply_operations` applies a list of edits (insert, move,
+rename, delete) to it. All go through bulk_create / bulk_update, which skip save()
+and the model signals, so the work those do for each row is done here once
+for the batch: storing uploads as blobs, counting blob references, queueing
+the probe and HLS jobs, the course's lecture stats and the catalog cache.
+Callers run these inside transaction.atomic(); the course create and
+update views use api.blobs.atomic(), which also deletes the files stored
+for a write that rolls back.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import course_tag, invalidate
+from api.models import Course, MediaBlob, MediaJob, Variant, VariantItem, rebuild_course_stats
+
+
+LECTURE_FIELDS = ("title", "description", "preview")
+
+
+def _store_file(lecture):
+    # As VariantItem.save() would; bulk writes only store the row.
+    if lecture.file and not lecture.file._committed:
+        MediaBlob.store(lecture.file)
+    if lecture.file:
+        lecture.media_status = "processing"
+
+
+def _new_lecture(variant, data, position):
+    lecture = VariantItem(
+        variant=variant, position=position, file=data.get("file"), **{field: data.get(field) for field in LECTURE_FIELDS}
+    )
+    _store_file(lecture)
+    return lecture
+
+
+def _files_changed(lectures, released=()):
+    """Count blob references and queue media jobs for `lectures`, whose files are new."""
+    with_files = [lecture for lecture in lectures if lecture.file]
+    for name, count in Counter(lecture.file.name for lecture in with_files).items():
+        MediaBlob.retain(name, count)
+    for name in released:
+        MediaBlob.release(name)
+    for lecture in lectures:
+        # What the post_save receivers and VariantItem.save() would remember.
+        lecture._probed_file = lecture._blob_names["file"] = lecture.file.name or None
+    MediaJob.enqueue_many("probe", with_files)
+    MediaJob.enqueue_many("hls", with_files)
+
+
+def create_curriculum(course, sections):
+    """
+    Create `sections` (CurriculumInputSerializer's validated "variants")
+    under `course` with one INSERT for the sections and one for the
+    lectures. Returns the new variants.
+    """
+    variants = Variant.objects.bulk_create(
+        [Variant(course=course, title=section["variant_title"], position=index) for index, section in enumerate(sections)]
+    )
+    lectures = VariantItem.objects.bulk_create([
+        _new_lecture(variant, data, index)
+        for variant, section in zip(variants, sections)
+        for index, data in enumerate(section["items"])
+    ])
+    _files_changed(lectures)
+
+    # New lectures have no duration until they are probed.
+    Course.adjust_stats({"pk": course.pk}, lecture_count=len(lectures))
+    transaction.on_commit(lambda: invalidate(course_tag(course.pk)))
+    return variants
+
+
+def _existing_section(variants, section):
+    variant_id = section.get("variant_id")
+    if variant_id and variant_id.isdigit():
+        return variants.get(int(variant_id))
+    return None
+
+
+def update_curriculum(course, sections):
+    """
+    Make `course`'s curriculum match `sections` (CurriculumInputSerializer's
+    validated "variants"). Sections are matched by `variant_id` (their
+    primary key) and lectures by `variant_item_id` anywhere in the course,
+    so a lecture can move between sections; whatever isn't submitted is
+    deleted, and positions follow the submitted order. The stored tree is
+    read in two queries and each kind of change is written in one
+    statement. Returns how many rows changed:
+    {"sections": {"created", "updated", "reordered", "deleted"},
+     "lectures": {"created", "updated", "moved", "reordered", "deleted"}}.
+    """
+    now = timezone.now()
+    variants = {variant.pk: variant for variant in Variant.objects.filter(course=course)}
+    lectures = {lecture.variant_item_id: lecture for lecture in VariantItem.objects.filter(variant__course=course)}
+    stored_sections = {lecture.pk: lecture.variant_id for lecture in lectures.values()}
+
+    # Sections: match, rename, reorder, create.
+    kept_variants, changed_variants, variant_fields, new_variants = set(), [], set(), []
+    section_variants = []
+    reordered_variants = 0
+    for position, section in enumerate(sections):
+        variant = _existing_section(variants, section)
+        if variant is None or variant.pk in kept_variants:
+            variant = Variant(course=course, title=section["variant_title"], position=position)
+            new_variants.append(variant)
+        else:
+            kept_variants.add(variant.pk)
+            fields = set()
+            if variant.title != section["variant_title"]:
+                variant.title = section["variant_title"]
+                fields.add("title")
+            if variant.position != position:
+                variant.position = position
+                fields.add("position")
+                reordered_variants += 1
+            if fields:
+                variant.updated_at = now
+                variant_fields.update(fields, {"updated_at"})
+                changed_variants.append(variant)
+        section_variants.append(variant)
+    Variant.objects.bulk_create(new_variants)
+    if changed_variants:
+        Variant.objects.bulk_update(changed_variants, sorted(variant_fields))
+
+    # Lectures: match, diff, create.
+    kept_lectures, new_lectures, changed, update_fields = set(), [], [], set()
+    new_files, released = [], []
+    moved = reordered = 0
+    for variant, section in zip(section_variants, sections):
+        for position, data in enumerate(section["items"]):
+            lecture = lectures.get(data.get("variant_item_id"))
+            if lecture is None or lecture.pk in kept_lectures:
+                new_lectures.append(_new_lecture(variant, data, position))
+                continue
+            kept_lectures.add(lecture.pk)
+
+            fields = {field for field in LECTURE_FIELDS if getattr(lecture, field) != data.get(field)}
+            for field in fields:
+                setattr(lecture, field, data.get(field))
+            if lecture.variant_id != variant.pk:
+                lecture.variant = variant
+                fields.add("variant")
+                moved += 1
+            elif lecture.position != position:
+                reordered += 1
+            if lecture.position != position:
+                lecture.position = position
+                fields.add("position")
+            # No `file` key: the form sent the current file's URL.
+            if "file" in data:
+                previous = lecture.file.name or None
+                lecture.file = data["file"]
+                _store_file(lecture)
+                if (lecture.file.name or None) != previous:
+                    fields.update({"file", "media_status"})
+                    new_files.append(lecture)
+                    if previous:
+                        released.append(previous)
+            if fields:
+                lecture.updated_at = now
+                update_fields.update(fields, {"updated_at"})
+                changed.append(lecture)
+
+    VariantItem.objects.bulk_create(new_lectures)
+    if changed:
+        VariantItem.objects.bulk_update(changed, sorted(update_fields))
+    _files_changed(new_lectures + new_files, released)
+
+    # Deleting goes through the model signals (blob references, stats,
+    # cache), which is fine for the few rows an edit removes. A removed
+    # section's lectures go with it unless they were moved out.
+    removed_lectures = [pk for pk in (lecture.pk for lecture in lectures.values()) if pk not in kept_lectures]
+    removed_variants = [pk for pk in variants if pk not in kept_variants]
+
+    # As in apply_operations: the bulk writes skip touch_lecture_variant, so
+    # the sections whose lectures changed get their `updated_at` bumped here.
+    touched = {lecture.variant_id for lecture in changed + new_lectures}
+    touched.update(stored_sections[lecture.pk] for lecture in changed)
+    touched.update(stored_sections[pk] for pk in removed_lectures)
+    Variant.objects.filter(pk__in=touched - set(removed_variants)).update(updated_at=now)
+
+    VariantItem.objects.filter(pk__in=removed_lectures).delete()
+    Variant.objects.filter(pk__in=removed_variants).delete()
+
+    rebuild_course_stats(Course.objects.filter(pk=course.pk))
+    transaction.on_commit(lambda: invalidate(course_tag(course.pk)))
+    return {
+        "sections": {
+            "created": len(new_variants),
+            "updated": len(changed_variants),
+            "reordered": reordered_variants,
+            "deleted": len(removed_variants),
+        },
+        "lectures": {
+            "created": len(new_lectures),
+            "updated": len(changed),
+            "moved": moved,
+            "reordered": reordered,
+            "deleted": len(removed_lectures),
+        },
+    }
+
+
+
+class CurriculumError(Exception):
+    """An operation that doesn't fit the curriculum; `index` is its place in the list."""
+
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+def _place(rows, row, position):
+    # At `position`, or last when it is missing or past the end.
+    rows.insert(len(rows) if position is None else min(position, len(rows)), row)
+
+
+def _renumber(rows, changed):
+    # Each row's position becomes its index; stored rows that change place are marked.
+    for position, row in enumerate(rows):
+        if row.pk is not None and row.position != position:
+            changed.setdefault(row, set()).add("position")
+        row.position = position
+
+
+def _write_changes(model, changed, now):
+    # `changed` maps rows to their changed fields; one UPDATE for all of them.
+    if not changed:
+        return
+    for row in changed:
+        row.updated_at = now
+    model.objects.bulk_update(list(changed), sorted(set().union(*changed.values(), {"updated_at"})))
+
+
+def apply_operations(course, operations):
+    """
+    Apply `operations` (CurriculumOperationsSerializer's validated
+    "operations") to `course`'s curriculum, in order:
+
+        {"op": "insert", "type": "section", "title", "position"}
+        {"op": "insert", "type": "lecture", "section", "title", "description", "preview", "position"}
+        {"op": "move", "type": "section", "id", "position"}
+        {"op": "move", "type": "lecture", "id", "section", "position"}
+        {"op": "rename", "type": "section" | "lecture", "id", "title", ...}
+        {"op": "delete", "type": "section" | "lecture", "id"}
+
+    `id` and `section` are primary keys of rows that existed before the
+    request; a missing `position` means last. Positions stay dense (0, 1,
+    ...), so a move shifts the rows between its old and new place. The
+    edits are made in memory on the tree read in two queries, and only the
+    rows whose title, section or position changed are written back, one
+    statement per model and kind of write. Raises CurriculumError for the
+    first operation that doesn't apply. Returns the counts of
+    update_curriculum plus the primary keys of the inserted rows under
+    "created": {"sections": [...], "lectures": [...]}.
+    """
+    now = timezone.now()
+    variants = list(Variant.objects.filter(course=course))
+    sections = {variant.pk: variant for variant in variants}
+    section_lectures = {variant.pk: [] for variant in variants}
+    for lecture in VariantItem.objects.filter(variant__course=course):
+        section_lectures[lecture.variant_id].append(lecture)
+    lectures = {lecture.pk: lecture for rows in section_lectures.values() for lecture in rows}
+    stored_sections = {lecture.pk: lecture.variant_id for lecture in lectures.values()}
+
+    new_variants, new_lectures, removed_variants, removed_lectures = [], [], [], []
+    changed_variants, changed_lectures = {}, {}
+
+    def existing(rows, index, pk, kind):
+        if pk not in rows:
+            raise CurriculumError(index, f"This course has no {kind} with id {pk}.")
+        return rows[pk]
+
+    for index, operation in enumerate(operations):
+        op, position = operation["op"], operation.get("position")
+
+        if operation["type"] == "section":
+            if op == "insert":
+                variant = Variant(course=course, title=operation.get("title"))
+                new_variants.append(variant)
+                _place(variants, variant, position)
+                continue
+            variant = existing(sections, index, operation.get("id"), "section")
+            if op == "move":
+                variants.remove(variant)
+                _place(variants, variant, position)
+            elif op == "rename":
+                if "title" in operation and variant.title != operation["title"]:
+                    variant.title = operation["title"]
+                    changed_variants.setdefault(variant, set()).add("title")
+            elif op == "delete":
+                # Its lectures go with it.
+                variants.remove(variant)
+                del sections[variant.pk]
+                for lecture in section_lectures.pop(variant.pk):
+                    del lectures[lecture.pk]
+                    changed_lectures.pop(lecture, None)
+                    removed_lectures.append(lecture.pk)
+                changed_variants.pop(variant, None)
+                removed_variants.append(variant.pk)
+            continue
+
+        if op == "insert":
+            variant = existing(sections, index, operation.get("section"), "section")
+            lecture = VariantItem(variant=variant, **{field: operation[field] for field in LECTURE_FIELDS if field in operation})
+            new_lectures.append(lecture)
+            _place(section_lectures[variant.pk], lecture, position)
+            continue
+        lecture = existing(lectures, index, operation.get("id"), "lecture")
+        if op == "move":
+            variant = existing(sections, index, operation.get("section", lecture.variant_id), "section")
+            section_lectures[lecture.variant_id].remove(lecture)
+            _place(section_lectures[variant.pk], lecture, position)
+            lecture.variant = variant
+        elif op == "rename":
+            for field in LECTURE_FIELDS:
+                if field in operation and getattr(lecture, field) != operation[field]:
+                    setattr(lecture, field, operation[field])
+                    changed_lectures.setdefault(lecture, set()).add(field)
+        elif op == "delete":
+            section_lectures[lecture.variant_id].remove(lecture)
+            del lectures[lecture.pk]
+            changed_lectures.pop(lecture, None)
+            removed_lectures.append(lecture.pk)
+
+    moved = 0
+    for lecture in lectures.values():
+        if lecture.variant_id != stored_sections[lecture.pk]:
+            changed_lectures.setdefault(lecture, set()).add("variant")
+            moved += 1
+
+    # Number what is left densely; only rows whose number changed are written.
+    _renumber(variants, changed_variants)
+    for variant in variants:
+        _renumber(section_lectures.get(variant.pk, []), changed_lectures)
+
+    Variant.objects.bulk_create(new_variants)
+    VariantItem.objects.bulk_create(new_lectures)
+    _write_changes(Variant, changed_variants, now)
+    _write_changes(VariantItem, changed_lectures, now)
+
+    # Bulk writes skip the receivers that bump `updated_at` on the parents
+    # (touch_lecture_variant), which the course detail ETags are built from.
+    touched = {lecture.variant_id for lecture in list(changed_lectures) + new_lectures}
+    touched.update(stored_sections[lecture.pk] for lecture in changed_lectures)
+    touched.update(stored_sections[pk] for pk in removed_lectures)
+    Variant.objects.filter(pk__in=touched - set(removed_variants)).update(updated_at=now)
+    Course.objects.filter(pk=course.pk).update(updated_at=now)
+
+    # As in update_curriculum, deletes go through the model signals, which
+    # also take the removed lectures out of the course's stats. A removed
+    # section's lectures are listed in removed_lectures.
+    VariantItem.objects.filter(pk__in=removed_lectures).delete()
+    Variant.objects.filter(pk__in=removed_variants).delete()
+    if new_lectures:
+        Course.adjust_stats({"pk": course.pk}, lecture_count=len(new_lectures))
+
+    transaction.on_commit(lambda: invalidate(course_tag(course.pk)))
+    return {
+        "sections": {
+            "created": len(new_variants),
+            "updated": len(changed_variants),
+            "reordered": sum("position" in fields for fields in changed_variants.values()),
+            "deleted": len(removed_variants),
+        },
+        "lectures": {
+            "created": len(new_lectures),
+            "updated": len(changed_lectures),
+            "moved": moved,
+            "reordered": sum("position" in fields and "variant" not in fields for fields in changed_lectures.values()),
+            "deleted": len(removed_lectures),
+        },
+        "created": {
+            "sections": [variant.pk for variant in new_variants],
+            "lectures": [lecture.pk for lecture in new_lectures],
+        },
+    }
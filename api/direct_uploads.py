@@ -0,0 +1,125 @@
+"""
+Uploads that go from the browser straight to S3.
+
+With USE_S3, `issue()` returns a presigned POST (URL plus form fields)
+for one object key chosen here, with the size and Content-Type pinned by
+the policy, and a signed token naming the field it is meant for. The
+client POSTs the file to S3 and then sends the token back; `complete()`
+checks the object that arrived and points the field at it. The file's
+bytes never pass through the app servers.
+"""
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core import signing
+
+from api.models import Course, VariantItem
+
+
+# Largest object a single S3 POST accepts.
+POST_MAX_SIZE = 5 * 1024 ** 3
+
+# How long after the URL is issued the upload can still be completed.
+COMPLETE_WITHIN = 24 * 60 * 60
+
+SALT = "api.direct_uploads"
+
+# target -> (model, field, required Content-Type prefix)
+TARGETS = {
+    "course.image": (Course, "image", "image/"),
+    "course.file": (Course, "file", ""),
+    "lecture.file": (VariantItem, "file", ""),
+}
+
+
+class DirectUploadError(Exception):
+    pass
+
+
+def s3_storage(storage):
+    """`storage` if it is S3, else None."""
+    if not settings.USE_S3:
+        return None
+    from storages.backends.s3boto3 import S3Boto3Storage
+
+    return storage if isinstance(storage, S3Boto3Storage) else None
+
+
+def _key(storage, name):
+    # The storage's name -> the bucket key (AWS_LOCATION prefix).
+    return storage._normalize_name(storage._clean_name(name))
+
+
+def issue(target, instance, filename, size, content_type=None):
+    """The presigned POST and completion token for uploading `filename` to the `target` field of `instance`."""
+    model, field_name, type_prefix = TARGETS[target]
+    field = model._meta.get_field(field_name)
+    storage = s3_storage(field.storage)
+    if storage is None:
+        raise DirectUploadError("Direct uploads need S3 storage.")
+
+    content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if not content_type.startswith(type_prefix):
+        raise DirectUploadError(f"Expected a file of type {type_prefix}*, got {content_type}.")
+    max_size = min(settings.CHUNKED_UPLOAD_MAX_SIZE, POST_MAX_SIZE)
+    if not 0 < size <= max_size:
+        raise DirectUploadError(f"Files can be at most {max_size} bytes.")
+
+    # upload_to, then a random suffix instead of storage.get_available_name(),
+    # which would ask S3 whether the name is taken.
+    name = field.generate_filename(instance, os.path.basename(filename))
+    root, ext = os.path.splitext(name)
+    name = storage.get_alternative_name(root, ext)
+
+    fields = {"Content-Type": content_type}
+    if storage.default_acl:
+        fields["acl"] = storage.default_acl
+    for parameter, value in storage.object_parameters.items():
+        if parameter == "CacheControl":
+            fields["Cache-Control"] = value
+    conditions = [{key: value} for key, value in fields.items()]
+    conditions.append(["content-length-range", size, size])
+
+    expires_in = settings.DIRECT_UPLOAD_EXPIRY
+    post = storage.connection.meta.client.generate_presigned_post(
+        storage.bucket_name, _key(storage, name), Fields=fields, Conditions=conditions, ExpiresIn=expires_in,
+    )
+    token = signing.dumps(
+        {"target": target, "pk": instance.pk, "name": name, "size": size, "type": content_type}, salt=SALT,
+    )
+    return {"method": "POST", "url": post["url"], "fields": post["fields"], "token": token, "expires_in": expires_in}
+
+
+def complete(token):
+    """Check the object uploaded for `token` and attach it to its field; return the instance."""
+    try:
+        upload = signing.loads(token, salt=SALT, max_age=settings.DIRECT_UPLOAD_EXPIRY + COMPLETE_WITHIN)
+    except signing.BadSignature:
+        raise DirectUploadError("Invalid or expired upload token.")
+
+    from botocore.exceptions import ClientError
+
+    model, field_name, _ = TARGETS[upload["target"]]
+    instance = model.objects.filter(pk=upload["pk"]).first()
+    if instance is None:
+        raise DirectUploadError("The object this upload was for no longer exists.")
+    field_file = getattr(instance, field_name)
+    if field_file.name == upload["name"]:
+        return instance
+
+    storage = s3_storage(field_file.storage)
+    if storage is None:
+        raise DirectUploadError("Direct uploads need S3 storage.")
+    try:
+        head = storage.connection.meta.client.head_object(Bucket=storage.bucket_name, Key=_key(storage, upload["name"]))
+    except ClientError:
+        raise DirectUploadError("The file has not been uploaded.")
+    if head["ContentLength"] != upload["size"] or head.get("ContentType") != upload["type"]:
+        storage.delete(upload["name"])
+        raise DirectUploadError("The uploaded file does not match what was announced.")
+
+    # Saving queues the same work as a form upload (probing, HLS, image sizes).
+    field_file.name = upload["name"]
+    instance.save()
+    return instance
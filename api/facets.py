@@ -0,0 +1,146 @@
+"""
+Server-side catalog filtering and facet counts.
+
+Facet counts come from one grouped query: the candidate courses are grouped
+by every facet at once (category, level, language, price bucket, featured),
+which yields at most a few hundred rows however large the catalog is, and each
+facet is then tallied from those rows in Python. Counts are disjunctive: a
+facet's counts honour every active filter except its own, so picking
+"Beginner" still shows how many courses the other levels would give.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+from rest_framework.exceptions import ValidationError
+
+from api.models import LANGUAGE, LEVEL
+
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = (
+    ("free", "Free", None, Decimal("0.01")),
+    ("under-20", "Under $20", Decimal("0.01"), Decimal("20")),
+    ("20-50", "$20 - $50", Decimal("20"), Decimal("50")),
+    ("50-100", "$50 - $100", Decimal("50"), Decimal("100")),
+    ("over-100", "Over $100", Decimal("100"), None),
+)
+
+FACETS = ("category", "level", "language", "price", "featured")
+
+# Grouped-row column each facet is read from.
+FACET_COLUMNS = {
+    "category": "category__slug",
+    "level": "level",
+    "language": "language",
+    "price": "price_bucket",
+    "featured": "featured",
+}
+
+
+def _bucket_q(lower, upper):
+    q = Q()
+    if lower is not None:
+        q &= Q(price__gte=lower)
+    if upper is not None:
+        q &= Q(price__lt=upper)
+    return q
+
+
+def price_bucket():
+    return Case(
+        *[When(_bucket_q(lower, upper), then=Value(key)) for key, label, lower, upper in PRICE_BUCKETS],
+        output_field=CharField(),
+    )
+
+
+def _decimal(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "A valid number is required."})
+
+
+def parse_filters(params):
+    """
+    Read the facet filters from query params. Each facet takes one value or
+    a comma-separated list (?level=Beginner,Intermediate); price buckets use
+    the keys in PRICE_BUCKETS and featured takes true/false.
+    """
+    filters = {}
+    for facet in FACETS:
+        raw = params.get(facet)
+        if not raw:
+            continue
+        values = {value.strip() for value in raw.split(",") if value.strip()}
+        if facet == "featured":
+            values = {value.lower() in ("1", "true", "yes") for value in values}
+        if values:
+            filters[facet] = values
+    return filters
+
+
+def filter_price_range(queryset, params):
+    """?price_min= / ?price_max= narrow the candidate set; they are not a facet."""
+    price_min = _decimal(params, "price_min")
+    price_max = _decimal(params, "price_max")
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+    return queryset
+
+
+def filter_courses(queryset, filters):
+    for facet, values in filters.items():
+        if facet == "category":
+            queryset = queryset.filter(category__slug__in=values)
+        elif facet == "price":
+            q = Q()
+            for key, label, lower, upper in PRICE_BUCKETS:
+                if key in values:
+                    q |= _bucket_q(lower, upper)
+            queryset = queryset.filter(q) if q else queryset.none()
+        else:
+            queryset = queryset.filter(**{f"{facet}__in": values})
+    return queryset
+
+
+def facet_counts(queryset, filters):
+    """
+    Count `queryset` (the candidates before facet filters) per facet value
+    with a single grouped query.
+    """
+    rows = list(
+        queryset
+        .annotate(price_bucket=price_bucket())
+        .order_by()
+        .values("category__slug", "category__title", "level", "language", "price_bucket", "featured")
+        .annotate(count=Count("id"))
+    )
+
+    def matches(row, skip):
+        return all(row[FACET_COLUMNS[facet]] in values for facet, values in filters.items() if facet != skip)
+
+    counts = {facet: {} for facet in FACETS}
+    category_titles = {}
+    for row in rows:
+        category_titles[row["category__slug"]] = row["category__title"]
+        for facet in FACETS:
+            if matches(row, facet):
+                value = row[FACET_COLUMNS[facet]]
+                counts[facet][value] = counts[facet].get(value, 0) + row["count"]
+
+    def listing(facet, choices):
+        return [{"value": value, "label": label, "count": counts[facet].get(value, 0)} for value, label in choices]
+
+    categories = sorted(((slug, title) for slug, title in category_titles.items() if slug is not None), key=lambda category: category[1])
+    return {
+        "category": [entry for entry in listing("category", categories) if entry["count"]],
+        "level": listing("level", LEVEL),
+        "language": listing("language", LANGUAGE),
+        "price": listing("price", [(key, label) for key, label, lower, upper in PRICE_BUCKETS]),
+        "featured": listing("featured", [(True, "Featured"), (False, "Not featured")]),
+    }
@@ -0,0 +1,113 @@
+"""
+HLS packaging of lecture videos into an adaptive bitrate ladder.
+
+`package(source, output_dir, info)` runs one ffmpeg pass that decodes the
+upload once and writes every rung of LADDER at or below the source height,
+each as a VOD media playlist with 4 second segments, plus a master
+playlist (MASTER_PLAYLIST) listing them. The caller stores the directory
+(see api/media.py).
+"""
+import mimetypes
+import os
+import subprocess
+
+from django.conf import settings
+
+from api import mediainfo
+
+
+MASTER_PLAYLIST = "master.m3u8"
+SEGMENT_SECONDS = 4
+
+# (name, height, video kbit/s, audio kbit/s)
+LADDER = (
+    ("240p", 240, 400, 64),
+    ("360p", 360, 800, 96),
+    ("480p", 480, 1400, 128),
+    ("720p", 720, 2800, 128),
+    ("1080p", 1080, 5000, 160),
+)
+
+
+# Storages (S3) set Content-Type from the name; some systems map .ts to
+# Qt translation files.
+mimetypes.add_type("video/mp2t", ".ts")
+
+
+class PackagingError(mediainfo.PermanentMediaError):
+    pass
+
+
+def renditions(height):
+    """The rungs of LADDER worth making for a source `height` pixels high (at least the lowest)."""
+    rungs = [rung for rung in LADDER if height is None or rung[1] <= height]
+    return rungs or [LADDER[0]]
+
+
+def command(binary, source, output_dir, info):
+    rungs = renditions(info.height)
+    has_audio = info.audio_codec is not None
+
+    # Decode once, scale once per rung.
+    split = f"[0:v]split={len(rungs)}" + "".join(f"[v{index}]" for index in range(len(rungs)))
+    scales = [f"[v{index}]scale=-2:{height}[v{index}out]" for index, (_, height, _, _) in enumerate(rungs)]
+    args = [binary, "-hide_banner", "-nostdin", "-y", "-i", source, "-filter_complex", ";".join([split, *scales])]
+
+    stream_map = []
+    for index, (name, _, video_kbps, audio_kbps) in enumerate(rungs):
+        args += [
+            "-map", f"[v{index}out]",
+            f"-c:v:{index}", "libx264",
+            f"-b:v:{index}", f"{video_kbps}k",
+            f"-maxrate:v:{index}", f"{int(video_kbps * 1.07)}k",
+            f"-bufsize:v:{index}", f"{video_kbps * 2}k",
+        ]
+        if has_audio:
+            args += ["-map", "0:a:0", f"-c:a:{index}", "aac", f"-b:a:{index}", f"{audio_kbps}k"]
+            stream_map.append(f"v:{index},a:{index},name:{name}")
+        else:
+            stream_map.append(f"v:{index},name:{name}")
+
+    if has_audio:
+        args += ["-ac", "2"]
+    args += [
+        "-preset", getattr(settings, "HLS_PRESET", "veryfast"),
+        "-profile:v", "main",
+        "-pix_fmt", "yuv420p",
+        # Keyframes on segment boundaries, the same in every rung, so players can switch.
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SECONDS})",
+        "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(output_dir, "%v", "segment_%04d.ts"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(output_dir, "%v", "index.m3u8"),
+    ]
+    return args
+
+
+def package(source, output_dir, info=None):
+    """Write the HLS renditions of the video at `source` into `output_dir`."""
+    binary = mediainfo.ffmpeg_binary()
+    if binary is None:
+        raise PackagingError("ffmpeg is not available.")
+    if info is None:
+        info = mediainfo.inspect(source)
+    if info.video_codec is None:
+        raise PackagingError(f"{source} has no video stream.")
+
+    for name, _, _, _ in renditions(info.height):
+        os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+    try:
+        result = subprocess.run(
+            command(binary, source, output_dir, info),
+            capture_output=True, text=True, errors="replace",
+            timeout=getattr(settings, "HLS_TIMEOUT", 2 * 60 * 60),
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise PackagingError(f"ffmpeg failed: {exc}")
+    if result.returncode != 0 or not os.path.exists(os.path.join(output_dir, MASTER_PLAYLIST)):
+        lines = result.stderr.strip().splitlines()
+        raise PackagingError(lines[-1] if lines else f"ffmpeg exited with {result.returncode}")
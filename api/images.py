@@ -0,0 +1,109 @@
+"""
+Resized copies of uploaded images (course, category, teacher and profile
+pictures), so pages fetch a card-sized file instead of the original upload.
+
+`render` runs in the media worker's process pool (see api/media.py), whose
+processes never set up Django, so nothing here needs it. Pillow is imported
+on first use; the models import this module for their admin thumbnails.
+"""
+import io
+import os
+
+from api.mediainfo import PermanentMediaError
+
+
+# name: (width, height). A height of None keeps the aspect ratio; with both
+# set the image is cropped to fill the box. Nothing is scaled up.
+SIZES = {
+    "thumb": (100, 100),
+    "small": (320, None),
+    "medium": (640, None),
+    "large": (1280, None),
+}
+
+# format: (file extension, Pillow save options)
+FORMATS = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+class UnreadableImageError(PermanentMediaError):
+    pass
+
+
+def variant_name(source_name, size, fmt):
+    """Storage name of a derivative, next to the original: course-file/a.png -> course-file/a-small.webp"""
+    stem = os.path.splitext(source_name)[0]
+    return f"{stem}-{size}.{FORMATS[fmt][0]}"
+
+
+def _resize(image, width, height):
+    from PIL import Image, ImageOps
+
+    if height is not None:
+        scale = min(1, image.width / width, image.height / height)
+        return ImageOps.fit(image, (round(width * scale), round(height * scale)), Image.LANCZOS)
+    if image.width <= width:
+        return image.copy()
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: put transparent images on white.
+    from PIL import Image
+
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def render(path):
+    """
+    Encode every size in SIZES, in every format in FORMATS, from the image
+    at `path`. Returns {size: {"width": w, "height": h, fmt: bytes, ...}}.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(path)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        raise UnreadableImageError(str(exc))
+    with image:
+        # Let the JPEG decoder downscale while decoding: a 1920px original
+        # only needs to be read at the largest size we produce.
+        largest = max(width for width, _ in SIZES.values())
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+
+        rendered = {}
+        for size, (width, height) in SIZES.items():
+            resized = _resize(image, width, height)
+            variant = {"width": resized.width, "height": resized.height}
+            for fmt, (_, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                (_flatten(resized) if fmt == "jpeg" else resized).save(buffer, **options)
+                variant[fmt] = buffer.getvalue()
+            rendered[size] = variant
+        return rendered
+
+
+def recorded_sizes(image_variants, source_name):
+    """
+    The derivatives recorded in an `image_variants` column, as
+    {size: {"width": w, "height": h, fmt: storage name}}, or {} while they
+    are missing or were made from an image other than `source_name`.
+    """
+    if not image_variants or not source_name or image_variants.get("source") != source_name:
+        return {}
+    return image_variants.get("sizes", {})
+
+
+def thumbnail_name(instance):
+    """Storage name for admin list thumbnails: the "thumb" JPEG once it exists, else the original."""
+    thumb = recorded_sizes(instance.image_variants, instance.image.name).get("thumb")
+    return thumb["jpeg"] if thumb else instance.image.name
@@ -0,0 +1,100 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import serializer as api_serializers
+from api.models import Category, Course, EnrolledCourse, Review, Teacher, Variant, VariantItem, rebuild_course_stats
+from api.views import course_card_queryset
+from userauths.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a catalog and time one listing page serialized with CourseSerializer (the old listing) "
+        "and with CourseCardSerializer. The seed is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=20, help="Courses on the page.")
+        parser.add_argument("--sections", type=int, default=3)
+        parser.add_argument("--lectures", type=int, default=4, help="Lectures per section.")
+        parser.add_argument("--students", type=int, default=3, help="Enrolled students (each leaves a review) per course.")
+        parser.add_argument("--iterations", type=int, default=3)
+
+    def seed(self, courses, sections, lectures, students):
+        user = User.objects.create(email="benchmark-teacher@example.com", username="benchmark-teacher")
+        teacher = Teacher.objects.create(user=user, full_name="Benchmark Teacher")
+        category, _ = Category.objects.get_or_create(title="Benchmark")
+        # create(), not bulk_create(): the serializers read the profile a post_save receiver adds.
+        learners = [
+            User.objects.create(email=f"benchmark-student{index}@example.com", username=f"benchmark-student{index}")
+            for index in range(students)
+        ]
+        seeded = [
+            Course.objects.create(
+                teacher=teacher, category=category, title=f"Benchmark course {index}", description="<p>About</p>",
+                price=10, platform_status="Published", teacher_course_status="Published",
+            )
+            for index in range(courses)
+        ]
+        variants = Variant.objects.bulk_create([
+            Variant(course=course, title=f"Section {section}", position=section)
+            for course in seeded for section in range(sections)
+        ])
+        VariantItem.objects.bulk_create([
+            VariantItem(variant=variant, title=f"Lecture {lecture}", description="Notes " * 20, position=lecture)
+            for variant in variants for lecture in range(lectures)
+        ])
+        EnrolledCourse.objects.bulk_create([
+            EnrolledCourse(course=course, user=learner, teacher=teacher) for course in seeded for learner in learners
+        ])
+        Review.objects.bulk_create([
+            Review(course=course, user=learner, review="Good", rating=4, active=True)
+            for course in seeded for learner in learners
+        ])
+        courses = Course.objects.filter(pk__in=[course.pk for course in seeded])
+        rebuild_course_stats(courses)
+        return courses
+
+    def time(self, iterations, func):
+        # Counted with a wrapper: the old listing runs more queries than the debug log keeps.
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):
+            for _ in range(iterations):
+                body = func()
+        return (time.perf_counter() - started) / iterations * 1000, queries // iterations, body
+
+    def handle(self, *args, **options):
+        counts = [options[name] for name in ("courses", "sections", "lectures", "students", "iterations")]
+        if min(counts) < 1:
+            raise CommandError("--courses, --sections, --lectures, --students and --iterations must be at least 1.")
+        courses, sections, lectures, students, iterations = counts
+        context = {"request": Request(APIRequestFactory().get("/"))}
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            catalog = self.seed(courses, sections, lectures, students).order_by("-date")
+            listings = (
+                ("CourseSerializer", lambda: renderer.render(
+                    api_serializers.CourseSerializer(catalog, many=True, context=context).data
+                )),
+                ("CourseCardSerializer", lambda: renderer.render(
+                    api_serializers.CourseCardSerializer(course_card_queryset(catalog), many=True, context=context).data
+                )),
+            )
+            self.stdout.write(f"{courses} courses, {sections} sections x {lectures} lectures, {students} students each:")
+            for name, render in listings:
+                elapsed, queries, body = self.time(iterations, render)
+                self.stdout.write(f"  {name}: {elapsed:.2f} ms, {queries} queries, {len(body)} bytes")
+            transaction.set_rollback(True)
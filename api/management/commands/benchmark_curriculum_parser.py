@@ -0,0 +1,82 @@
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from api import serializer as api_serializers
+from api.parsers import nested_form_data
+
+
+def scan_per_section(data):
+    # The previous approach: one scan of every key per section, lectures
+    # split wherever a `title` appears.
+    sections = []
+    for key, value in data.items():
+        if key.startswith('variants') and '[variant_title]' in key:
+            index = key.split('[')[1].split(']')[0]
+            items, current = [], {}
+            for item_key, item_value in data.items():
+                if f'variants[{index}][items]' in item_key:
+                    field_name = item_key.split('[')[-1].split(']')[0]
+                    if field_name == 'title':
+                        if current:
+                            items.append(current)
+                        current = {}
+                    current[field_name] = item_value
+            if current:
+                items.append(current)
+            sections.append({'variant_title': value, 'items': items})
+    return sections
+
+
+class Command(BaseCommand):
+    help = "Time parsing a large multipart course form (sections x lectures), per-section scans vs nested_form_data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sections", type=int, default=50)
+        parser.add_argument("--lectures", type=int, default=10, help="Lectures per section.")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def form(self, sections, lectures):
+        data = QueryDict(mutable=True)
+        data.update({"title": "Course", "description": "A course", "price": "10"})
+        for section in range(sections):
+            data[f"variants[{section}][variant_title]"] = f"Section {section}"
+            data[f"variants[{section}][variant_id]"] = str(section + 1)
+            for lecture in range(lectures):
+                prefix = f"variants[{section}][items][{lecture}]"
+                data[f"{prefix}[title]"] = f"Lecture {section}.{lecture}"
+                data[f"{prefix}[description]"] = "About this lecture"
+                data[f"{prefix}[preview]"] = "false"
+                data[f"{prefix}[variant_item_id]"] = f"{section:05d}{lecture:05d}"
+                data[f"{prefix}[file]"] = SimpleUploadedFile(f"{section}-{lecture}.mp4", b"")
+        return data
+
+    def time(self, iterations, func):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            result = func()
+        return (time.perf_counter() - started) / iterations * 1000, result
+
+    def handle(self, *args, **options):
+        sections, lectures, iterations = options["sections"], options["lectures"], options["iterations"]
+        if min(sections, lectures, iterations) < 1:
+            raise CommandError("--sections, --lectures and --iterations must be at least 1.")
+
+        data = self.form(sections, lectures)
+        scan, _ = self.time(iterations, lambda: scan_per_section(data))
+        nest, nested = self.time(iterations, lambda: nested_form_data(data))
+
+        def validate():
+            serializer = api_serializers.CurriculumInputSerializer(data=nested)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data["variants"]
+
+        validation, curriculum = self.time(iterations, validate)
+        self.stdout.write(
+            f"{sections} sections x {lectures} lectures ({len(data)} keys): "
+            f"per-section scans {scan:.2f} ms, single pass {nest:.2f} ms, "
+            f"serializer validation {validation:.2f} ms, "
+            f"{sum(len(section['items']) for section in curriculum)} lectures parsed"
+        )
@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import mediainfo
+
+
+class Command(BaseCommand):
+    help = "Time api.mediainfo.inspect on a sample media file, and moviepy's VideoFileClip when it is installed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="A video or audio file to probe.")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def time(self, iterations, func):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            result = func()
+        return (time.perf_counter() - started) / iterations * 1000, result
+
+    def handle(self, *args, **options):
+        path, iterations = options["path"], options["iterations"]
+        if iterations < 1:
+            raise CommandError("--iterations must be at least 1.")
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+
+        binary = mediainfo.ffprobe_binary() or mediainfo.ffmpeg_binary()
+        if binary is None:
+            raise CommandError("Neither ffprobe nor ffmpeg is available.")
+        try:
+            elapsed, info = self.time(iterations, lambda: mediainfo.inspect(path))
+        except mediainfo.MediaInspectionError as exc:
+            raise CommandError(f"Could not probe {path}: {exc}")
+        self.stdout.write(f"inspect ({os.path.basename(binary)}): {elapsed:.2f} ms, {info}")
+
+        try:
+            from moviepy.editor import VideoFileClip
+        except ImportError:
+            self.stdout.write("VideoFileClip: skipped, moviepy is not installed")
+            return
+
+        def probe():
+            with VideoFileClip(path) as clip:
+                return clip.duration
+
+        elapsed, duration = self.time(iterations, probe)
+        self.stdout.write(f"VideoFileClip: {elapsed:.2f} ms, duration {duration}")
@@ -0,0 +1,55 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import serializer as api_serializers
+from api.models import CartOrderItem, Course
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Time JSON rendering and parsing of the course detail and teacher order list payloads, stdlib vs orjson."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def payloads(self):
+        context = {"request": Request(APIRequestFactory().get("/"))}
+        course = Course.objects.filter(platform_status="Published", teacher_course_status="Published").first()
+        if course is not None:
+            yield "course detail", api_serializers.CourseSerializer(course, context=context).data
+        order_item = CartOrderItem.objects.exclude(teacher=None).first()
+        if order_item is not None:
+            items = CartOrderItem.objects.filter(teacher=order_item.teacher)[:20]
+            yield "teacher order list", api_serializers.CartOrderItemSerializer(items, many=True, context=context).data
+
+    def time(self, iterations, func):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        if iterations < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        for name, data in self.payloads():
+            results = []
+            for renderer, parser in ((JSONRenderer(), JSONParser()), (FastJSONRenderer(), FastJSONParser())):
+                body = renderer.render(data)
+                render = self.time(iterations, lambda: renderer.render(data))
+                parse = self.time(iterations, lambda: parser.parse(io.BytesIO(body)))
+                results.append((body, render, parse))
+
+            (stdlib_body, stdlib_render, stdlib_parse), (fast_body, fast_render, fast_parse) = results
+            self.stdout.write(
+                f"{name} ({len(stdlib_body)} bytes): render {stdlib_render:.3f} -> {fast_render:.3f} ms, "
+                f"parse {stdlib_parse:.3f} -> {fast_parse:.3f} ms, identical output: {stdlib_body == fast_body}"
+            )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import serializer as api_serializers
+from api.models import CartOrder, Course, EnrolledCourse, Review
+
+
+# (serializer, model) pairs timed against the first row of each model.
+BENCHMARKS = (
+    ("CourseSerializer", Course),
+    ("EnrolledCourseSerializer", EnrolledCourse),
+    ("ReviewSerializer", Review),
+    ("CartOrderSerializer", CartOrder),
+)
+
+
+class Command(BaseCommand):
+    help = "Time serializer instantiation (field construction) and to_representation on existing rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        if iterations < 1:
+            raise CommandError("--iterations must be at least 1.")
+        request = Request(APIRequestFactory().get("/"))
+        context = {"request": request}
+
+        for name, model in BENCHMARKS:
+            instance = model.objects.first()
+            if instance is None:
+                self.stdout.write(f"{name}: skipped, no {model.__name__} rows")
+                continue
+            serializer_class = getattr(api_serializers, name)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                serializer_class(instance, context=context).fields
+            build = (time.perf_counter() - started) / iterations
+
+            # A fresh serializer each time, as per request: nested fields are
+            # built lazily during to_representation.
+            started = time.perf_counter()
+            for _ in range(iterations):
+                serializer_class(instance, context=context).to_representation(instance)
+            render = (time.perf_counter() - started) / iterations
+
+            self.stdout.write(f"{name}: instantiate {build * 1000:.3f} ms, instantiate + to_representation {render * 1000:.3f} ms")
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import startup
+
+
+class Command(BaseCommand):
+    help = "Time django.setup() plus the URLconf import in a fresh interpreter and fail past a budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=float, default=settings.STARTUP_BUDGET_MS, help="Milliseconds allowed.")
+        parser.add_argument("--runs", type=int, default=3, help="Best of this many runs is compared with the budget.")
+        parser.add_argument("--serverless", action="store_true", help="Measure the serverless entry point's configuration.")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1.")
+        try:
+            best, loaded = startup.best_of(options["runs"], options["serverless"])
+        except startup.StartupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"django.setup() + URLconf: best {best:.0f} ms of {options['runs']} run(s), budget {options['budget']:.0f} ms")
+
+        if loaded:
+            raise CommandError(f"Imported at startup but should load lazily: {', '.join(loaded)}")
+        if best > options["budget"]:
+            raise CommandError(f"Startup took {best:.0f} ms, over the {options['budget']:.0f} ms budget.")
+        self.stdout.write(self.style.SUCCESS("Startup within budget."))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import uploads
+from api.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked lecture uploads (and their staging files) that were never finished."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Delete unfinished uploads untouched for this long.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted = 0
+        for upload in ChunkedUpload.objects.filter(status="uploading", updated_at__lt=cutoff).iterator():
+            uploads.discard(upload)
+            deleted += 1
+        # Finished uploads only record where a file came from.
+        ChunkedUpload.objects.filter(status="complete", updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} stale upload(s)"))
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import media
+
+
+def _run(job):
+    try:
+        return media.run_job(job)
+    finally:
+        # Each pool thread has its own connection; don't leave it open.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Run queued background media jobs (lecture probing and HLS packaging, image resizing) on a thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Jobs run at the same time.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of polling.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                jobs = media.claim_jobs(workers)
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+                    continue
+
+                results = list(pool.map(_run, jobs))
+                self.stdout.write(f"Ran {len(results)} job(s), {results.count(False)} failed.")
+
+        self.stdout.write(self.style.SUCCESS("No media jobs due."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import Category, Course, MediaJob, Teacher
+from userauths.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Queue resizing jobs for course, category, teacher and profile images that have no current derivatives."
+
+    def handle(self, *args, **options):
+        for model in (Course, Category, Teacher, Profile):
+            queued = 0
+            for instance in model.objects.exclude(image="").exclude(image=None).only("id", "image", "image_variants").iterator():
+                if not images.recorded_sizes(instance.image_variants, instance.image.name):
+                    MediaJob.enqueue("images", instance)
+                    queued += 1
+            self.stdout.write(f"{model.__name__}: queued {queued} job(s)")
+        self.stdout.write(self.style.SUCCESS("Run `manage.py process_media` to make them."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Course, rebuild_course_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating, enrolment and lecture stats on courses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_ids", nargs="*", help="Only rebuild these course_id values (default: every course).")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options["course_ids"]:
+            courses = courses.filter(course_id__in=options["course_ids"])
+
+        updated = rebuild_course_stats(courses)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {updated} course(s)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Course
+from api.search import index_courses
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for courses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_ids", nargs="*", help="Only reindex these course_id values (default: every course).")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options["course_ids"]:
+            courses = courses.filter(course_id__in=options["course_ids"])
+
+        indexed = index_courses(courses)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} course(s)."))
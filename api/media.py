@@ -0,0 +1,277 @@
+"""
+Background media processing.
+
+Saving an upload only records a `MediaJob`; `manage.py process_media` claims
+due jobs and runs them on a thread pool. Each job kind maps to a handler in
+HANDLERS that receives the target row. A failing job is retried with a
+growing delay, and after MAX_ATTEMPTS the job and its target are marked
+failed; one failing on bad input (mediainfo.PermanentMediaError) is marked
+failed at once. CPU-bound work is kept off the worker threads: image
+resizing goes to a process pool and transcoding runs in ffmpeg's own
+process.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api import hls, images, mediainfo
+from api.models import MediaBlob, MediaJob, VariantItem
+
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=1)
+# A running job whose worker died is picked up again after this long; it
+# must exceed the longest transcode (HLS_TIMEOUT, 2 hours by default).
+STALE_AFTER = timedelta(hours=3)
+# Job kinds whose final failure marks the lecture's media_status failed. A
+# lecture without HLS renditions still plays its original file.
+STATUS_JOBS = {"probe"}
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def local_path(field_file):
+    """A filesystem path for `field_file`, copying it locally if the storage (S3) has none."""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(field_file.name)[1]) as copy:
+        with field_file.open("rb") as source:
+            shutil.copyfileobj(source, copy)
+        copy.flush()
+        yield copy.name
+
+
+def format_duration(seconds):
+    minutes, remainder = divmod(seconds, 60)
+    return f"{math.floor(minutes)}m {math.floor(remainder)}s"
+
+
+def _blob_info(blob, key, value):
+    # Record what was learnt about a blob's content, unless another job already did.
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().get(pk=blob.pk)
+        if key not in blob.info:
+            blob.info[key] = value
+            blob.save(update_fields=["info"])
+        return blob.info[key]
+
+
+def probe_lecture(item):
+    file_name = item.file.name
+    blob = MediaBlob.objects.filter(file=file_name).first()
+    seconds = blob.info.get("duration") if blob else None
+    if seconds is None:
+        with local_path(item.file) as path:
+            seconds = mediainfo.inspect(path).duration
+        if blob:
+            _blob_info(blob, "duration", seconds)
+
+    with transaction.atomic():
+        item = VariantItem.objects.select_for_update().get(pk=item.pk)
+        if item.file.name != file_name:
+            # Replaced while we were probing; the newer upload has its own job.
+            return
+        item.duration = timedelta(seconds=seconds)
+        item.content_duration = format_duration(seconds)
+        item.media_status = "ready"
+        item.save(update_fields=["duration", "content_duration", "media_status", "updated_at"])
+
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+
+def image_pool():
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            # spawn, not fork: this process has threads and open connections.
+            _image_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_WORKERS", None),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _image_pool
+
+
+def _save_variants(storage, source, rendered):
+    sizes = {}
+    for size, variant in rendered.items():
+        sizes[size] = {"width": variant["width"], "height": variant["height"]}
+        for fmt in images.FORMATS:
+            name = images.variant_name(source, size, fmt)
+            # Left over from an earlier attempt at the same source.
+            if storage.exists(name):
+                storage.delete(name)
+            sizes[size][fmt] = storage.save(name, ContentFile(variant[fmt]))
+    return {"source": source, "sizes": sizes}
+
+
+def make_image_variants(instance):
+    """Write the images.SIZES derivatives of `instance.image` and record them in `image_variants`."""
+    model = type(instance)
+    source = instance.image.name
+    if not source:
+        return
+
+    # Default images are shared by many rows; render them once.
+    variants = (
+        model.objects.filter(image=source, image_variants__source=source)
+        .exclude(pk=instance.pk)
+        .values_list("image_variants", flat=True)
+        .first()
+    )
+    if variants is None:
+        with local_path(instance.image) as path:
+            rendered = image_pool().submit(images.render, path).result()
+        variants = _save_variants(instance.image.storage, source, rendered)
+
+    with transaction.atomic():
+        instance = model.objects.select_for_update().get(pk=instance.pk)
+        if instance.image.name != source:
+            # Replaced while we were resizing; the newer upload has its own job.
+            return
+        instance.image_variants = variants
+        update_fields = ["image_variants"]
+        if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+            update_fields.append("updated_at")
+        instance.save(update_fields=update_fields)
+
+
+def delete_tree(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        storage.delete(f"{directory}/{name}")
+    for name in directories:
+        delete_tree(storage, f"{directory}/{name}")
+
+
+def _package(field_file, directory):
+    storage = field_file.storage
+    with local_path(field_file) as path, tempfile.TemporaryDirectory() as output_dir:
+        info = mediainfo.inspect(path)
+        hls.package(path, output_dir, info)
+        for root, _, files in os.walk(output_dir):
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, "/")
+                with open(os.path.join(root, name), "rb") as content:
+                    saved = storage.save(f"{directory}/{relative}", File(content))
+                if saved != f"{directory}/{relative}":
+                    # Playlists refer to segments by relative name.
+                    raise hls.PackagingError(f"Storage renamed {directory}/{relative} to {saved}")
+
+    return {
+        "playlist": f"{directory}/{hls.MASTER_PLAYLIST}",
+        "renditions": [
+            {"name": name, "height": height, "bandwidth": (video_kbps + audio_kbps) * 1000}
+            for name, height, video_kbps, audio_kbps in hls.renditions(info.height)
+        ],
+    }
+
+
+def package_lecture(item):
+    """
+    Package `item.file` as HLS (api/hls.py), store it under hls/ and record
+    it in `item.hls`. Content stored as a MediaBlob is packaged once, under
+    hls/blobs/, and shared by every lecture using it.
+    """
+    file_name = item.file.name
+    storage = item.file.storage
+    own_directory = f"hls/{item.pk}/"
+
+    blob = MediaBlob.objects.filter(file=file_name).first()
+    packaged = blob.info.get("hls") if blob else None
+    if packaged is None:
+        if blob:
+            directory = f"hls/blobs/{blob.sha256}/{uuid.uuid4().hex[:12]}"
+        else:
+            directory = own_directory + uuid.uuid4().hex[:12]
+        packaged = _package(item.file, directory)
+        if blob:
+            shared = _blob_info(blob, "hls", packaged)
+            if shared != packaged:
+                # Another lecture with the same content got there first.
+                delete_tree(storage, directory)
+                packaged = shared
+
+    recorded = {"source": file_name, **packaged}
+    with transaction.atomic():
+        item = VariantItem.objects.select_for_update().get(pk=item.pk)
+        previous = item.hls.get("playlist")
+        if item.file.name != file_name:
+            # Replaced while we were transcoding; the newer upload has its own job.
+            previous = recorded["playlist"]
+        else:
+            item.hls = recorded
+            item.save(update_fields=["hls", "updated_at"])
+    # Renditions under hls/blobs/ belong to the blob, not to this lecture.
+    if previous and previous.startswith(own_directory):
+        delete_tree(storage, previous.rsplit("/", 1)[0])
+
+
+HANDLERS = {
+    "probe": probe_lecture,
+    "images": make_image_variants,
+    "hls": package_lecture,
+}
+
+
+def claim_jobs(limit):
+    """Mark up to `limit` due jobs as running and return them."""
+    now = timezone.now()
+    due = Q(status="pending", run_after__lte=now) | Q(status="running", locked_at__lt=now - STALE_AFTER)
+    with transaction.atomic():
+        jobs = list(MediaJob.objects.select_for_update(skip_locked=True).filter(due)[:limit])
+        MediaJob.objects.filter(pk__in=[job.pk for job in jobs]).update(status="running", locked_at=now, attempts=F("attempts") + 1)
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = "running", now, job.attempts + 1
+    return jobs
+
+
+def _set_media_status(target, status):
+    if target is not None and hasattr(target, "media_status"):
+        target.media_status = status
+        target.save(update_fields=["media_status", "updated_at"])
+
+
+def run_job(job):
+    """Run one claimed job, recording the outcome. Returns True on success."""
+    try:
+        target = job.target
+        if target is not None:
+            HANDLERS[job.kind](target)
+    except Exception as exc:
+        logger.exception("Media job %s failed (attempt %s)", job.pk, job.attempts)
+        failed = isinstance(exc, mediainfo.PermanentMediaError) or job.attempts >= MAX_ATTEMPTS
+        MediaJob.objects.filter(pk=job.pk).update(
+            status="failed" if failed else "pending",
+            error=f"{type(exc).__name__}: {exc}",
+            run_after=timezone.now() + RETRY_DELAY * job.attempts,
+            locked_at=None,
+        )
+        if failed and job.kind in STATUS_JOBS:
+            _set_media_status(job.target, "failed")
+        return False
+
+    MediaJob.objects.filter(pk=job.pk).update(status="done", error="", locked_at=None)
+    return True
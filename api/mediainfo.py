@@ -0,0 +1,137 @@
+"""
+Container metadata for uploaded media, read from the file headers only.
+
+Uses ffprobe when it is installed (or FFPROBE_BINARY is set). Otherwise it
+parses the stream summary `ffmpeg -i` prints, using FFMPEG_BINARY or the
+binary bundled with imageio-ffmpeg. Nothing is decoded and no Python media
+stack is imported.
+"""
+import json
+import re
+import shutil
+import subprocess
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+
+
+PROBE_TIMEOUT = 60
+
+
+class MediaInspectionError(Exception):
+    pass
+
+
+class PermanentMediaError(Exception):
+    """
+    The input can't be processed, so retrying won't help: the upload isn't
+    the kind of media expected, or the tools to read it are missing. The
+    media worker (api/media.py) fails a job that raises it on the first
+    attempt. Raised here, by api.hls and by api.images.
+    """
+
+
+class UnreadableMediaError(MediaInspectionError, PermanentMediaError):
+    pass
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    duration: float
+    width: int = None
+    height: int = None
+    video_codec: str = None
+    audio_codec: str = None
+    bitrate: int = None  # bits per second
+
+
+@lru_cache(maxsize=None)
+def ffprobe_binary():
+    return getattr(settings, "FFPROBE_BINARY", None) or shutil.which("ffprobe")
+
+
+@lru_cache(maxsize=None)
+def ffmpeg_binary():
+    binary = getattr(settings, "FFMPEG_BINARY", None) or shutil.which("ffmpeg")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        return None
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _run(args):
+    try:
+        return subprocess.run(args, capture_output=True, text=True, errors="replace", timeout=PROBE_TIMEOUT)
+    except FileNotFoundError as exc:
+        raise UnreadableMediaError(f"{args[0]} failed: {exc}")
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise MediaInspectionError(f"{args[0]} failed: {exc}")
+
+
+def _number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _from_ffprobe(binary, path):
+    result = _run([binary, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path])
+    if result.returncode != 0:
+        raise UnreadableMediaError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+    data = json.loads(result.stdout or "{}")
+    container = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+
+    duration = _number(container.get("duration"), float)
+    if duration is None:
+        raise UnreadableMediaError(f"No duration found in {path}")
+    return MediaInfo(
+        duration=duration,
+        width=video.get("width"),
+        height=video.get("height"),
+        video_codec=video.get("codec_name"),
+        audio_codec=audio.get("codec_name"),
+        bitrate=_number(container.get("bit_rate"), int),
+    )
+
+
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)(?:.*?bitrate: (\d+) kb/s)?")
+VIDEO_RE = re.compile(r"Stream #.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})")
+AUDIO_RE = re.compile(r"Stream #.*?: Audio: (\w+)")
+
+
+def _from_ffmpeg(binary, path):
+    # `ffmpeg -i` without an output prints the input summary and exits 1.
+    output = _run([binary, "-hide_banner", "-nostdin", "-i", path]).stderr
+    duration = DURATION_RE.search(output)
+    if duration is None:
+        raise UnreadableMediaError(output.strip().splitlines()[-1] if output.strip() else f"Could not read {path}")
+    hours, minutes, seconds, bitrate = duration.groups()
+    video = VIDEO_RE.search(output)
+    audio = AUDIO_RE.search(output)
+    return MediaInfo(
+        duration=int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        width=int(video.group(2)) if video else None,
+        height=int(video.group(3)) if video else None,
+        video_codec=video.group(1) if video else None,
+        audio_codec=audio.group(1) if audio else None,
+        bitrate=int(bitrate) * 1000 if bitrate else None,
+    )
+
+
+def inspect(path):
+    """Return the MediaInfo for the media file at `path`."""
+    binary = ffprobe_binary()
+    if binary:
+        return _from_ffprobe(binary, path)
+    binary = ffmpeg_binary()
+    if binary:
+        return _from_ffmpeg(binary, path)
+    raise UnreadableMediaError("Neither ffprobe nor ffmpeg is available.")
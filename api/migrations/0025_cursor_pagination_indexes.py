@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_alter_question_answer_message_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['cart_id', '-date'], name='cart_cart_id_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartorderitem',
+            index=models.Index(fields=['teacher', '-date'], name='orderitem_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['teacher', '-date'], name='coupon_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['platform_status', 'teacher_course_status', '-date'], name='course_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['teacher', '-date'], name='course_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrolledcourse',
+            index=models.Index(fields=['user', '-date'], name='enrolled_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'course', '-date'], name='note_user_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['teacher', 'seen', '-date'], name='noti_teacher_seen_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question_answer',
+            index=models.Index(fields=['course', '-date'], name='qa_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['course', '-date'], name='review_course_date_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:26
+
+import datetime
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce, Round
+
+
+def backfill_course_stats(apps, schema_editor):
+    Course = apps.get_model('api', 'Course')
+    Review = apps.get_model('api', 'Review')
+    EnrolledCourse = apps.get_model('api', 'EnrolledCourse')
+    VariantItem = apps.get_model('api', 'VariantItem')
+
+    def aggregate(queryset, expression, lookup='course'):
+        rows = queryset.filter(**{lookup: models.OuterRef('pk')}).order_by().values(lookup)
+        return models.Subquery(rows.annotate(value=expression).values('value')[:1])
+
+    reviews = Review.objects.all()
+    average = aggregate(reviews, models.Avg('rating'))
+    lectures = VariantItem.objects.all()
+    Course.objects.update(
+        rating_sum=Coalesce(aggregate(reviews, models.Sum('rating')), 0),
+        rating_count=Coalesce(aggregate(reviews, models.Count('id')), 0),
+        average_rating=average,
+        rating=Coalesce(Cast(Round(average), models.IntegerField()), 0),
+        active_review_count=Coalesce(aggregate(reviews.filter(active=True), models.Count('id')), 0),
+        student_count=Coalesce(aggregate(EnrolledCourse.objects.all(), models.Count('id')), 0),
+        lecture_count=Coalesce(aggregate(lectures, models.Count('id'), 'variant__course'), 0),
+        lecture_duration=Coalesce(aggregate(lectures, models.Sum('duration'), 'variant__course'), models.Value(datetime.timedelta(0))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_review_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='average_rating',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lecture_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lecture_duration',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='student_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
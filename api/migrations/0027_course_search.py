@@ -0,0 +1,111 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:27
+
+import html
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.html import strip_tags
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE api_coursesearchdocument ADD COLUMN document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(teacher, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX api_coursesearchdocument_document_gin ON api_coursesearchdocument USING gin (document)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS api_coursesearchdocument_document_gin",
+    "ALTER TABLE api_coursesearchdocument DROP COLUMN IF EXISTS document",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_coursesearchdocument_fts USING fts5(
+        title, category, teacher, body,
+        content='api_coursesearchdocument', content_rowid='course_id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER api_coursesearchdocument_ai AFTER INSERT ON api_coursesearchdocument BEGIN
+        INSERT INTO api_coursesearchdocument_fts (rowid, title, category, teacher, body)
+        VALUES (new.course_id, new.title, new.category, new.teacher, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER api_coursesearchdocument_ad AFTER DELETE ON api_coursesearchdocument BEGIN
+        INSERT INTO api_coursesearchdocument_fts (api_coursesearchdocument_fts, rowid, title, category, teacher, body)
+        VALUES ('delete', old.course_id, old.title, old.category, old.teacher, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER api_coursesearchdocument_au AFTER UPDATE ON api_coursesearchdocument BEGIN
+        INSERT INTO api_coursesearchdocument_fts (api_coursesearchdocument_fts, rowid, title, category, teacher, body)
+        VALUES ('delete', old.course_id, old.title, old.category, old.teacher, old.body);
+        INSERT INTO api_coursesearchdocument_fts (rowid, title, category, teacher, body)
+        VALUES (new.course_id, new.title, new.category, new.teacher, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_coursesearchdocument_au",
+    "DROP TRIGGER IF EXISTS api_coursesearchdocument_ad",
+    "DROP TRIGGER IF EXISTS api_coursesearchdocument_ai",
+    "DROP TABLE IF EXISTS api_coursesearchdocument_fts",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def build_documents(apps, schema_editor):
+    Course = apps.get_model('api', 'Course')
+    CourseSearchDocument = apps.get_model('api', 'CourseSearchDocument')
+    CourseSearchDocument.objects.bulk_create(
+        [
+            CourseSearchDocument(
+                course_id=course.pk,
+                title=course.title,
+                category=course.category.title if course.category else '',
+                teacher=course.teacher.full_name,
+                body=html.unescape(strip_tags(course.description or '')),
+            )
+            for course in Course.objects.select_related('teacher', 'category').iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_course_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='api.course')),
+                ('title', models.CharField(max_length=100)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('teacher', models.CharField(blank=True, max_length=100)),
+                ('body', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
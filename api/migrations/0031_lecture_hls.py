@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantitem',
+            name='hls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
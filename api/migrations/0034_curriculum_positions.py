@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+def number_positions(apps, schema_editor):
+    # Number sections within each course and lectures within each section
+    # in the order they used to be shown in (by date).
+    Variant = apps.get_model('api', 'Variant')
+    VariantItem = apps.get_model('api', 'VariantItem')
+    for model, parent in ((Variant, 'course_id'), (VariantItem, 'variant_id')):
+        rows, counters = [], {}
+        for row in model.objects.order_by(parent, 'date', 'id').only('id', parent).iterator(chunk_size=2000):
+            row.position = counters.get(getattr(row, parent), 0)
+            counters[getattr(row, parent)] = row.position + 1
+            rows.append(row)
+        model.objects.bulk_update(rows, ['position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='variant',
+            options={'ordering': ['position', 'id'], 'verbose_name_plural': 'Variant'},
+        ),
+        migrations.AlterModelOptions(
+            name='variantitem',
+            options={'ordering': ['position', 'id'], 'verbose_name_plural': 'Variant Item'},
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='variantitem',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(number_positions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='variant',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, default=None),
+        ),
+        migrations.AlterField(
+            model_name='variantitem',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, default=None),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['course', 'position'], name='variant_course_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variantitem',
+            index=models.Index(fields=['variant', 'position'], name='lecture_variant_position_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_curriculum_positions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='course-file'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='image',
+            field=models.FileField(blank=True, db_index=True, default='course.jpg', null=True, upload_to='course-file'),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='file',
+            field=models.FileField(db_index=True, upload_to='blobs'),
+        ),
+        migrations.AlterField(
+            model_name='variantitem',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='course-file', verbose_name='Lecture File'),
+        ),
+    ]
@@ -1,20 +1,45 @@
-from django.db import models
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import F, Q, Case, When, Value
+from django.db.models.functions import Cast, Coalesce, Round
 from shortuuid.django_fields import ShortUUIDField
 from django.utils.html import mark_safe
 from django.utils import timezone
 from django.dispatch import receiver
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django_ckeditor_5.fields import CKEditor5Field
 
 from userauths.models import User, Profile
+from api import blobs, images
+from api.images import thumbnail_name
 
-from moviepy.editor import VideoFileClip
-
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import timedelta  # Import timedelta for duration conversion
 
+MEDIA_STATUS = (
+    ("processing", "Processing"),
+    ("ready", "Ready"),
+    ("failed", "Failed"),
+)
+
+UPLOAD_STATUS = (
+    ("uploading", "Uploading"),
+    ("complete", "Complete"),
+)
+
+MEDIA_JOB_STATUS = (
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("done", "Done"),
+    ("failed", "Failed"),
+)
+
 STATUS = (
     ("Draft", "Draft"),
     ("Disabled", "Disabled"),
@@ -68,6 +93,8 @@ LANGUAGE = (
 class Teacher(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.FileField(upload_to="course-file", blank=True, null=True, default="default.jpg")
+    # Resized copies of `image`, written by the media worker (api/media.py).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     full_name = models.CharField(max_length=100)
     bio = models.CharField(max_length=100, null=True, blank=True)
     facebook = models.URLField(null=True, blank=True)
@@ -97,6 +124,7 @@ class Teacher(models.Model):
 class Category(models.Model):
     title = models.CharField(max_length=100)
     image = models.ImageField(upload_to="course-file", default="category.jpg", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     active = models.BooleanField(default=True)
     slug = models.SlugField(unique=True, null=True, blank=True)
 
@@ -105,7 +133,7 @@ class Category(models.Model):
         ordering = ('title',)
 
     def thumbnail(self):
-        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.image.url))
+        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.image.storage.url(thumbnail_name(self))))
 
     def __str__(self):
         return self.title
@@ -121,8 +149,9 @@ class Category(models.Model):
 class Course(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
-    file = models.FileField(upload_to="course-file", blank=True, null=True)
-    image = models.FileField(upload_to="course-file", blank=True, null=True, default="course.jpg")
+    file = models.FileField(upload_to="course-file", blank=True, null=True, db_index=True)
+    image = models.FileField(upload_to="course-file", blank=True, null=True, default="course.jpg", db_index=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     title = models.CharField(max_length=100)
     description = CKEditor5Field('Text', config_name='extends')
     price = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, verbose_name="Sale Price")
@@ -132,63 +161,136 @@ class Course(models.Model):
     teacher_course_status = models.CharField(choices=VENDOR_COURSE_STATUS, max_length=50, default="published")
     featured = models.BooleanField(default=False, verbose_name="Marketplace Featured")
     rating = models.IntegerField(default=0, null=True, blank=True)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    average_rating = models.FloatField(null=True, blank=True)
+    active_review_count = models.IntegerField(default=0)
+    student_count = models.IntegerField(default=0)
+    lecture_count = models.IntegerField(default=0)
+    lecture_duration = models.DurationField(default=timedelta)
     course_id = ShortUUIDField(unique=True, length=6, max_length=30, alphabet="1234567890")
     slug = models.SlugField(null=True, blank=True)
     date = models.DateTimeField(default=timezone.now)
+    # Bumped whenever anything shown on the course pages changes; see the
+    # touch_* receivers below.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["platform_status", "teacher_course_status", "-date"], name="course_status_date_idx"),
+            models.Index(fields=["teacher", "-date"], name="course_teacher_date_idx"),
+        ]
+
+    # Maintained by the Review, EnrolledCourse and VariantItem signal receivers
+    # below (or rebuilt with `manage.py rebuild_course_stats`), never by save().
+    STATS_FIELDS = ("rating", "rating_sum", "rating_count", "average_rating", "active_review_count", "student_count", "lecture_count", "lecture_duration")
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title) + "-" + str(self.id)
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # A full save would write back whatever stats were loaded with this
+            # instance, undoing increments made by other requests since then.
+            kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.STATS_FIELDS]
         super(Course, self).save(*args, **kwargs) 
 
+    @classmethod
+    def adjust_stats(cls, lookup, **deltas):
+        # One UPDATE built from F() expressions, so concurrent writers add up
+        # instead of overwriting each other.
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        updates = {field: F(field) + delta for field, delta in deltas.items()}
+        if "rating_sum" in deltas or "rating_count" in deltas:
+            count_delta = deltas.get("rating_count", 0)
+            average = Cast(F("rating_sum") + deltas.get("rating_sum", 0), models.FloatField()) / (F("rating_count") + count_delta)
+            has_ratings = Q(rating_count__gt=-count_delta)
+            updates["average_rating"] = Case(When(has_ratings, then=average), default=Value(None), output_field=models.FloatField())
+            updates["rating"] = Case(When(has_ratings, then=Cast(Round(average), models.IntegerField())), default=Value(0), output_field=models.IntegerField())
+        cls.objects.filter(**lookup).update(**updates)
+
     def students(self):
-        return EnrolledCourse.objects.filter(course=self)
+        return self.enrolledcourse_set.all()
     
     def curriculum(self):
-        return Variant.objects.filter(course=self)
+        return self.variant_set.all()
     
     def variant(self):
-        return Variant.objects.filter(course=self)
+        return self.variant_set.all()
 
 
     def lectures(self):
-        return VariantItem.objects.filter(variant__course=self)
+        return VariantItem.objects.filter(variant__course=self).order_by("variant__position", "variant_id", "position", "id")
             
     def thumbnail(self):
-        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.image.url))
+        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.image.storage.url(thumbnail_name(self))))
    
 
-    def average_rating(self):
-        average_rating = Review.objects.filter(course=self).aggregate(avg_rating=models.Avg('rating'))
-        return average_rating['avg_rating']
-    
-    def rating_count(self):
-        return Review.objects.filter(course=self).count()
-    
     def reviews(self):
         return Review.objects.filter(course=self, active=True)
     
 
+class CourseSearchDocument(models.Model):
+    # Plain-text copy of the searchable course fields, kept in sync by
+    # api.search. The vendor-specific index over it (a weighted tsvector with a
+    # GIN index on PostgreSQL, an FTS5 table on SQLite) lives in the migration.
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    title = models.CharField(max_length=100)
+    category = models.CharField(max_length=100, blank=True)
+    teacher = models.CharField(max_length=100, blank=True)
+    body = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.title
+
+
+@contextmanager
+def _appending(row, parent, siblings):
+    """
+    Give `row` the position after the last of `siblings` if it has none.
+    The `parent` row (a queryset) stays locked until the block, the save,
+    ends, so concurrent appends to it take positions one after another.
+    """
+    if row.position is not None:
+        yield
+        return
+    with transaction.atomic():
+        list(parent.select_for_update().values_list("pk"))
+        last = siblings.aggregate(last=models.Max("position"))["last"]
+        row.position = 0 if last is None else last + 1
+        yield
+
+
 class Variant(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     title = models.CharField(max_length=1000, verbose_name="Variant Name", null=True, blank=True)
     variant_id = ShortUUIDField(length=10, max_length=25, alphabet="1234567890")
+    # Order within the course, from 0. Left empty, save() puts the section last.
+    position = models.PositiveIntegerField(default=None, blank=True)
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_items(self):
         return VariantItem.objects.filter(variant=self)
 
     class Meta:
-        ordering = ["date"]
+        ordering = ["position", "id"]
         verbose_name_plural = "Variant"
+        indexes = [models.Index(fields=["course", "position"], name="variant_course_position_idx")]
+
+    def save(self, *args, **kwargs):
+        with _appending(self, Course.objects.filter(pk=self.course_id), Variant.objects.filter(course_id=self.course_id)):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
     
     def items(self):
-        return VariantItem.objects.filter(variant=self)
+        return self.variant_items.all()
     
     def get_items(self):
         return VariantItem.objects.filter(variant=self)
@@ -196,53 +298,52 @@ class Variant(models.Model):
     def variant_items(self):
         return VariantItem.objects.filter(variant=self)
 
-import math
-
 class VariantItem(models.Model):
     variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='variant_items')
     title = models.CharField(max_length=1000, verbose_name="Lecture Title", null=True, blank=True)
     description = models.TextField(max_length=200, verbose_name="Lecture Description", null=True, blank=True)
-    file = models.FileField(upload_to="course-file", verbose_name="Lecture File", null=True, blank=True)
+    file = models.FileField(upload_to="course-file", verbose_name="Lecture File", null=True, blank=True, db_index=True)
     duration = models.DurationField(null=True, blank=True) 
     content_duration = models.CharField(null=True, blank=True, max_length=1000) 
     date = models.DateTimeField(auto_now_add=True)
     preview = models.BooleanField(default=False)
     variant_item_id = ShortUUIDField(length=10, max_length=25, alphabet="1234567890")
+    media_status = models.CharField(max_length=20, choices=MEDIA_STATUS, default="ready")
+    # Order within the section, from 0. Left empty, save() puts the lecture last.
+    position = models.PositiveIntegerField(default=None, blank=True)
+    # HLS renditions of `file` (api/hls.py): {"source", "playlist", "renditions"}.
+    hls = models.JSONField(default=dict, blank=True, editable=False)
+    media_jobs = GenericRelation("MediaJob")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ["date"]
+        ordering = ["position", "id"]
         verbose_name_plural = "Variant Item"
+        indexes = [models.Index(fields=["variant", "position"], name="lecture_variant_position_idx")]
 
     def __str__(self):
         return f"{self.variant.title} - {self.title}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)  # Call the original save() method first
-
-        if self.file:
-            clip = VideoFileClip(self.file.path)
-            duration_seconds = clip.duration
-            self.duration = timedelta(seconds=duration_seconds)
-
-            # Convert duration to minutes and seconds
-            minutes, remainder = divmod(duration_seconds, 60)
-
-            # Round seconds to nearest integer using round or math.floor
-            # seconds = round(remainder)  # Round to nearest integer
-
-            # Alternatively, round down using math.floor
-            minutes = math.floor(minutes)
-            seconds = math.floor(remainder)
-
-            # Construct the human-readable duration string
-            duration_text = f"{minutes}m {seconds}s"
-
-            # Optionally, you can store the duration_text in a separate field
-            # self.duration_text = duration_text
-            # super().save(update_fields=['duration_text'])
-
-            self.content_duration = duration_text
-            super().save(update_fields=['content_duration'])
+        # A new or replaced file is probed for its duration and packaged for
+        # HLS by the media worker (`manage.py process_media`), not on the
+        # request thread. Storing it first resolves a re-upload of the same
+        # content to the name it already has.
+        if self.file and not self.file._committed:
+            MediaBlob.store(self.file)
+        probe = bool(self.file) and self.file.name != self._probed_file
+        if probe:
+            self.media_status = "processing"
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "media_status"}
+
+        with _appending(self, Variant.objects.filter(pk=self.variant_id), VariantItem.objects.filter(variant_id=self.variant_id)):
+            super().save(*args, **kwargs)
+
+        if probe:
+            self._probed_file = self.file.name
+            MediaJob.enqueue("probe", self)
+            MediaJob.enqueue("hls", self)
 
 
 class Question_Answer(models.Model):
@@ -257,12 +358,13 @@ class Question_Answer(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [models.Index(fields=["course", "-date"], name="qa_course_date_idx")]
     
     def messages(self):
-        return Question_Answer_Message.objects.filter(question=self)
+        return self.question_answer_message_set.all()
 
     def profile(self):
-        return Profile.objects.get(user=self.user)
+        return self.user.profile
     
 
 class Question_Answer_Message(models.Model):
@@ -280,7 +382,7 @@ class Question_Answer_Message(models.Model):
         ordering = ['date']
 
     def profile(self):
-        return Profile.objects.get(user=self.user)
+        return self.user.profile
     
 
 class Certificate(models.Model):
@@ -306,6 +408,9 @@ class Cart(models.Model):
     cart_id = models.CharField(max_length=1000, null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["cart_id", "-date"], name="cart_cart_id_date_idx")]
+
     def __str__(self):
         return f'{self.cart_id} - {self.course.title}'
 
@@ -334,7 +439,7 @@ class CartOrder(models.Model):
         return self.oid
 
     def order_items(self):
-        return CartOrderItem.objects.filter(order=self)
+        return self.orderitem.all()
 
 class CartOrderItem(models.Model):
     order = models.ForeignKey(CartOrder, on_delete=models.CASCADE, related_name="orderitem")
@@ -353,9 +458,10 @@ class CartOrderItem(models.Model):
     class Meta:
         verbose_name_plural = "Cart Order Item"
         ordering = ["-date"]
+        indexes = [models.Index(fields=["teacher", "-date"], name="orderitem_teacher_date_idx")]
         
     def thumbnail(self):
-        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.course.image.url))
+        return mark_safe('<img src="%s" width="50" height="50" style="object-fit:cover; border-radius: 6px;" />' % (self.course.image.storage.url(thumbnail_name(self.course))))
    
     def order_id(self):
         return f"Order ID #{self.order.oid}"
@@ -385,6 +491,8 @@ class EnrolledCourse(models.Model):
     order_item = models.ForeignKey(CartOrderItem, on_delete=models.SET_NULL, null=True)
     enrollment_id = ShortUUIDField(length=20, prefix="ENR", max_length=50, alphabet="1234567890")
     date = models.DateTimeField(auto_now_add=True)
+    # Bumped by the student's own notes, completed lessons and review.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         if self.user:
@@ -394,15 +502,16 @@ class EnrolledCourse(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [models.Index(fields=["user", "-date"], name="enrolled_user_date_idx")]
 
     def lectures(self):
-        return VariantItem.objects.filter(variant__course=self.course)
+        return VariantItem.objects.filter(variant__course=self.course).order_by("variant__position", "variant_id", "position", "id")
 
     def completed_lesson(self):
         return CompletedLesson.objects.filter(course=self.course, user=self.user)
     
     def curriculum(self):
-        return Variant.objects.filter(course=self.course)
+        return self.course.variant_set.all()
     
     def note(self):
         return Note.objects.filter(course=self.course, user=self.user)
@@ -425,6 +534,7 @@ class Note(models.Model):
     class Meta:
         verbose_name_plural = "Note Pad"
         ordering = ["-date"]
+        indexes = [models.Index(fields=["user", "course", "-date"], name="note_user_course_date_idx")]
         
     def __str__(self):
         return f"{self.course.title} - {self.user.username}"
@@ -443,6 +553,7 @@ class Review(models.Model):
     class Meta:
         verbose_name_plural = "Reviews & Rating"
         ordering = ["-date"]
+        indexes = [models.Index(fields=["course", "-date"], name="review_course_date_idx")]
         
     def __str__(self):
         if self.course:
@@ -454,12 +565,203 @@ class Review(models.Model):
         return self.rating
     
     def profile(self):
-        return Profile.objects.get(user=self.user)
+        return self.user.profile
     
+def _shift_course_stats(lookup, old, new, stats):
+    # `old` and `new` are (course key, *stat args) snapshots taken before and
+    # after a write; the course on each side gets the difference applied.
+    changes = defaultdict(dict)
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None or state[0] is None:
+            continue
+        deltas = changes[state[0]]
+        for field, value in stats(*state[1:]).items():
+            deltas[field] = sign * value if field not in deltas else deltas[field] + sign * value
+
+    for key, deltas in changes.items():
+        Course.adjust_stats({lookup: key}, **deltas)
+
+def _review_stats(rating, active):
+    return {"rating_sum": rating or 0, "rating_count": 1, "active_review_count": int(bool(active))}
+
+def _enrollment_stats():
+    return {"student_count": 1}
+
+def _lecture_stats(duration):
+    return {"lecture_count": 1, "lecture_duration": duration or timedelta(0)}
+
+@receiver(post_init, sender=Review)
+def remember_review_stats(sender, instance, **kwargs):
+    instance._course_stats = (instance.course_id, instance.rating, instance.active)
+
 @receiver(post_save, sender=Review)
-def update_course_rating(sender, instance, **kwargs):
-    if instance.course:
-        instance.course.save()
+def update_course_rating(sender, instance, created, **kwargs):
+    new = (instance.course_id, instance.rating, instance.active)
+    _shift_course_stats("pk", None if created else instance._course_stats, new, _review_stats)
+    instance._course_stats = new
+
+@receiver(post_delete, sender=Review)
+def remove_course_rating(sender, instance, **kwargs):
+    _shift_course_stats("pk", instance._course_stats, None, _review_stats)
+
+@receiver(post_init, sender=EnrolledCourse)
+def remember_enrollment_stats(sender, instance, **kwargs):
+    instance._course_stats = (instance.course_id,)
+
+@receiver(post_save, sender=EnrolledCourse)
+def update_course_students(sender, instance, created, **kwargs):
+    new = (instance.course_id,)
+    _shift_course_stats("pk", None if created else instance._course_stats, new, _enrollment_stats)
+    instance._course_stats = new
+
+@receiver(post_delete, sender=EnrolledCourse)
+def remove_course_student(sender, instance, **kwargs):
+    _shift_course_stats("pk", instance._course_stats, None, _enrollment_stats)
+
+@receiver(post_init, sender=VariantItem)
+def remember_lecture_stats(sender, instance, **kwargs):
+    instance._course_stats = (instance.variant_id, instance.duration)
+    instance._probed_file = instance.file.name if instance.file else None
+
+@receiver(post_save, sender=VariantItem)
+def update_course_lectures(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {"variant", "duration"} & set(update_fields):
+        return
+    new = (instance.variant_id, instance.duration)
+    _shift_course_stats("variant", None if created else instance._course_stats, new, _lecture_stats)
+    instance._course_stats = new
+
+@receiver(post_delete, sender=VariantItem)
+def remove_course_lecture(sender, instance, **kwargs):
+    _shift_course_stats("variant", instance._course_stats, None, _lecture_stats)
+
+
+def _course_aggregate(queryset, expression, lookup="course"):
+    rows = queryset.filter(**{lookup: models.OuterRef("pk")}).order_by().values(lookup)
+    return models.Subquery(rows.annotate(value=expression).values("value")[:1])
+
+def rebuild_course_stats(courses):
+    # Recompute the stats columns from scratch in a single UPDATE, each column
+    # filled from a correlated aggregate over its source table.
+    reviews = Review.objects.all()
+    average = _course_aggregate(reviews, models.Avg("rating"))
+    lectures = VariantItem.objects.all()
+    return courses.update(
+        rating_sum=Coalesce(_course_aggregate(reviews, models.Sum("rating")), 0),
+        rating_count=Coalesce(_course_aggregate(reviews, models.Count("id")), 0),
+        average_rating=average,
+        rating=Coalesce(Cast(Round(average), models.IntegerField()), 0),
+        active_review_count=Coalesce(_course_aggregate(reviews.filter(active=True), models.Count("id")), 0),
+        student_count=Coalesce(_course_aggregate(EnrolledCourse.objects.all(), models.Count("id")), 0),
+        lecture_count=Coalesce(_course_aggregate(lectures, models.Count("id"), "variant__course"), 0),
+        lecture_duration=Coalesce(_course_aggregate(lectures, models.Sum("duration"), "variant__course"), Value(timedelta(0))),
+    )
+
+def _touch(model, **lookup):
+    # Bump `updated_at` without loading or re-saving the row.
+    model.objects.filter(**lookup).update(updated_at=timezone.now())
+
+@receiver([post_save, post_delete], sender=Variant)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=EnrolledCourse)
+@receiver([post_save, post_delete], sender=Question_Answer)
+@receiver([post_save, post_delete], sender=Question_Answer_Message)
+def touch_course(sender, instance, **kwargs):
+    if instance.course_id:
+        _touch(Course, pk=instance.course_id)
+
+@receiver([post_save, post_delete], sender=VariantItem)
+def touch_lecture_variant(sender, instance, **kwargs):
+    _touch(Variant, pk=instance.variant_id)
+    _touch(Course, variant=instance.variant_id)
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Note)
+@receiver([post_save, post_delete], sender=CompletedLesson)
+def touch_enrollment(sender, instance, **kwargs):
+    if instance.course_id and instance.user_id:
+        _touch(EnrolledCourse, course_id=instance.course_id, user_id=instance.user_id)
+
+@receiver(post_save, sender=Category)
+def touch_category_courses(sender, instance, created, **kwargs):
+    if not created:
+        _touch(Course, category=instance)
+
+@receiver(post_save, sender=Teacher)
+def touch_teacher_courses(sender, instance, created, **kwargs):
+    if not created:
+        _touch(Course, teacher=instance)
+
+# Resized copies of `image` (api/images.py) are made by the media worker
+# whenever a different file is saved.
+@receiver(post_init, sender=Teacher)
+@receiver(post_init, sender=Category)
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=Profile)
+def remember_image(sender, instance, **kwargs):
+    image = instance.__dict__.get("image")
+    instance._image_source = getattr(image, "name", image) or None
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Profile)
+def queue_image_variants(sender, instance, update_fields=None, **kwargs):
+    if "image" not in instance.__dict__ or (update_fields is not None and "image" not in update_fields):
+        # Deferred or not written: can't have changed.
+        return
+    name = instance.image.name or None
+    if name and name != instance._image_source:
+        MediaJob.enqueue("images", instance)
+    instance._image_source = name
+
+
+# Course and lecture files are stored once per content and shared
+# (MediaBlob, api/blobs.py). These fields are indexed for MediaBlob.in_use().
+BLOB_FIELDS = {Course: ("file", "image"), VariantItem: ("file",)}
+
+def _saved_blob_fields(sender, instance, update_fields):
+    # Deferred or not written: can't have changed.
+    return [
+        field for field in BLOB_FIELDS[sender]
+        if field in instance.__dict__ and (update_fields is None or field in update_fields)
+    ]
+
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=VariantItem)
+def remember_blobs(sender, instance, **kwargs):
+    instance._blob_names = {}
+    for field in BLOB_FIELDS[sender]:
+        value = instance.__dict__.get(field)
+        instance._blob_names[field] = getattr(value, "name", value) or None
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=VariantItem)
+def store_blobs(sender, instance, update_fields=None, **kwargs):
+    for field in _saved_blob_fields(sender, instance, update_fields):
+        field_file = getattr(instance, field)
+        if field_file and not field_file._committed:
+            MediaBlob.store(field_file)
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=VariantItem)
+def count_blob_references(sender, instance, created, update_fields=None, **kwargs):
+    for field in _saved_blob_fields(sender, instance, update_fields):
+        name = getattr(instance, field).name or None
+        previous = None if created else instance._blob_names.get(field)
+        if name != previous:
+            if name:
+                MediaBlob.retain(name)
+            if previous:
+                MediaBlob.release(previous)
+        instance._blob_names[field] = name
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=VariantItem)
+def release_blobs(sender, instance, **kwargs):
+    for name in instance._blob_names.values():
+        if name:
+            MediaBlob.release(name)
 
         
 class Notification(models.Model):
@@ -474,6 +776,7 @@ class Notification(models.Model):
     
     class Meta:
         verbose_name_plural = "Notification"
+        indexes = [models.Index(fields=["teacher", "seen", "-date"], name="noti_teacher_seen_date_idx")]
     
     def __str__(self):
         if self.order:
@@ -494,6 +797,7 @@ class Coupon(models.Model):
     
     class Meta:
         ordering =['-date']
+        indexes = [models.Index(fields=["teacher", "-date"], name="coupon_teacher_date_idx")]
 
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -513,4 +817,137 @@ class Country(models.Model):
         verbose_name_plural = "Country"
 
     def __str__(self):
-        return f"{self.name}"
\ No newline at end of file
+        return f"{self.name}"
+
+
+class MediaJob(models.Model):
+    """
+    A unit of background media work (see api/media.py), claimed and run by
+    `manage.py process_media`. Jobs are created in the same transaction as
+    the row they point at, so a worker never sees one before its target.
+    """
+    kind = models.CharField(max_length=50)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    target = GenericForeignKey("content_type", "object_id")
+    status = models.CharField(max_length=20, choices=MEDIA_JOB_STATUS, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["run_after", "id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="mediajob_status_run_after_idx"),
+            models.Index(fields=["content_type", "object_id"], name="mediajob_target_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.content_type.model} #{self.object_id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, kind, target):
+        return cls.objects.create(kind=kind, content_type=ContentType.objects.get_for_model(target), object_id=target.pk)
+
+    @classmethod
+    def enqueue_many(cls, kind, targets):
+        # For rows written with bulk_create, which skips save().
+        return cls.objects.bulk_create(
+            [cls(kind=kind, content_type=ContentType.objects.get_for_model(target), object_id=target.pk) for target in targets]
+        )
+
+
+class MediaBlob(models.Model):
+    """
+    One stored copy of some uploaded content, named by its SHA-256
+    (api/blobs.py). Every row whose file field holds `file.name` shares
+    it; `refcount` counts them and the copy is deleted once none is left.
+    `info` caches what the media worker found out about the content
+    ("duration" in seconds, "hls").
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blobs.DIRECTORY, db_index=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    info = models.JSONField(default=dict, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.file.name} ({self.refcount})"
+
+    @classmethod
+    def store(cls, field_file):
+        """Point the uncommitted `field_file` at the stored copy of its content, storing it if new."""
+        content = field_file.file
+        sha256 = blobs.sha256_of(content)
+        blob = cls.objects.filter(sha256=sha256).first()
+        if blob is None:
+            storage = field_file.storage
+            name = blobs.blob_name(sha256, field_file.name)
+            if not storage.exists(name):
+                name = storage.save(name, content)
+                blobs.written(storage, name)
+            blob, _ = cls.objects.get_or_create(sha256=sha256, defaults={"file": name, "size": content.size})
+        field_file.name = blob.file.name
+        field_file._committed = True
+        return blob
+
+    @classmethod
+    def retain(cls, name, count=1):
+        cls.objects.filter(file=name).update(refcount=F("refcount") + count)
+
+    @classmethod
+    def release(cls, name):
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(file=name).first()
+            if blob is None:
+                return
+            blob.refcount = max(blob.refcount - 1, 0)
+            if blob.refcount or blob.in_use():
+                blob.save(update_fields=["refcount"])
+                return
+            blob.delete()
+            transaction.on_commit(blob.delete_files)
+
+    def in_use(self):
+        # The count is only a fast path; never delete a file something still points at.
+        return any(
+            model.objects.filter(**{field: self.file.name}).exists()
+            for model, fields in BLOB_FIELDS.items() for field in fields
+        )
+
+    def delete_files(self):
+        from api.media import delete_tree
+
+        storage = self.file.storage
+        storage.delete(self.file.name)
+        # Resized copies (api/images.py) are named after the source.
+        for size in images.SIZES:
+            for fmt in images.FORMATS:
+                storage.delete(images.variant_name(self.file.name, size, fmt))
+        playlist = self.info.get("hls", {}).get("playlist")
+        if playlist:
+            delete_tree(storage, playlist.rsplit("/", 1)[0])
+
+
+class ChunkedUpload(models.Model):
+    """
+    A lecture file sent in pieces (api/uploads.py): created with its total
+    size, filled by PUTs at increasing offsets into a staging file outside
+    storage, then attached to a VariantItem. `offset` is how many bytes
+    have arrived, so an interrupted upload resumes from there.
+    """
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=UPLOAD_STATUS, default="uploading")
+    variant_item = models.ForeignKey(VariantItem, on_delete=models.SET_NULL, null=True, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,39 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class DateCursorPagination(CursorPagination):
+    """
+    Cursor pagination used by every list endpoint.
+
+    Pages are cut with `WHERE date < <cursor>` on an indexed column instead of
+    OFFSET, so page 1000 costs the same as page 1. The cursor holds only the
+    first ordering field; `-id` just makes the order deterministic. Rows that
+    share the cursor's `date` are skipped with a small offset, which DRF keeps
+    in the cursor, so pages stay correct but a long run of equal dates is
+    scanned again on each page. Views whose model has no `date` column set
+    `cursor_ordering`; its first field should be unchanging and nearly unique.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        return tuple(ordering)
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """
+    Pages through a ranked search result list.
+
+    Relevance order has no stable column to key a cursor on, but the list is
+    capped (`api.search.SEARCH_RESULT_LIMIT`), so numbered pages stay cheap.
+    Without a query the "list" is a queryset of every course, paged with
+    LIMIT/OFFSET in SQL.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
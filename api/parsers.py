@@ -0,0 +1,69 @@
+"""
+orjson-backed JSON parsing, with the stdlib JSONParser as the fallback, and
+nesting of bracketed multipart form keys.
+"""
+import re
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from api.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        # orjson rejects NaN and Infinity, so only STRICT_JSON can use it.
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+NESTED_KEY_RE = re.compile(r"^([^\[\]]+)((?:\[[^\[\]]*\])+)$")
+KEY_PART_RE = re.compile(r"\[([^\[\]]*)\]")
+
+
+def _listify(node):
+    if not isinstance(node, dict):
+        return node
+    node = {key: _listify(value) for key, value in node.items()}
+    if node and all(key.isdigit() for key in node):
+        # Index order; gaps left by removed rows close up.
+        return [node[key] for key in sorted(node, key=int)]
+    return node
+
+
+def nested_form_data(data):
+    """
+    Nest bracketed form keys in one pass over `data`:
+    {"variants[0][items][1][title]": "Intro"} becomes
+    {"variants": [{"items": [{"title": "Intro"}]}]}. Objects whose keys are
+    all numbers become lists; keys without brackets are kept as they are.
+    """
+    nested = {}
+    for key, value in data.items():
+        match = NESTED_KEY_RE.match(key)
+        if match is None:
+            nested.setdefault(key, value)
+            continue
+        parts = [match.group(1), *KEY_PART_RE.findall(match.group(2))]
+        node = nested
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise ParseError(f"Form field {key} conflicts with another field.")
+        if isinstance(node.get(parts[-1]), dict):
+            raise ParseError(f"Form field {key} conflicts with another field.")
+        node[parts[-1]] = value
+    return _listify(nested)
@@ -0,0 +1,33 @@
+"""
+orjson-backed JSON rendering, used whenever orjson is installed.
+
+For compact, unindented responses the output matches DRF's JSONRenderer:
+strings, numbers, dicts, lists, datetimes and UUIDs are encoded by orjson
+itself, and anything it doesn't know (Decimal, timedelta, lazy translation
+strings, ...) goes through DRF's own encoder. Indented output (the browsable
+API, `Accept: application/json; indent=4`) and the UNICODE_JSON=False,
+COMPACT_JSON=False or STRICT_JSON=False settings keep using the stdlib
+renderer. Under STRICT_JSON, NaN and Infinity become null instead of raising.
+"""
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        # Same escaping as JSONRenderer, so the output stays a strict
+        # JavaScript subset.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
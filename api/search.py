@@ -0,0 +1,217 @@
+"""
+Full-text course search.
+
+`CourseSearchDocument` holds a plain-text copy of each course's title,
+description, category and teacher name. On PostgreSQL the migration adds a
+weighted `tsvector` column over it with a GIN index; on SQLite (local and test
+databases) an FTS5 table kept in sync by triggers. Both match every word of
+the query as a prefix. Other backends fall back to `icontains` matching
+without ranking.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.html import escape, strip_tags
+
+from api.models import Category, Course, CourseSearchDocument, Teacher
+
+
+# Course fields copied into CourseSearchDocument; saves of other fields (the
+# stats counters, the media workers) leave the document alone.
+INDEXED_FIELDS = {"title", "description", "category", "teacher"}
+
+# Matches beyond this many are dropped before paging; nobody reads page 50 of
+# a search, and it keeps every page a bounded amount of work.
+SEARCH_RESULT_LIMIT = 1000
+
+# Highlight delimiters used inside SQL, swapped for <mark> once the text
+# around them has been HTML-escaped.
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+
+def _document(course):
+    return CourseSearchDocument(
+        course_id=course.pk,
+        title=course.title,
+        category=course.category.title if course.category else "",
+        teacher=course.teacher.full_name,
+        body=html.unescape(strip_tags(course.description or "")),
+    )
+
+
+def index_courses(courses):
+    """(Re)build the search documents for a Course queryset."""
+    documents = [_document(course) for course in courses.select_related("teacher", "category").iterator()]
+    CourseSearchDocument.objects.bulk_create(
+        documents,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["course"],
+        update_fields=["title", "category", "teacher", "body"],
+    )
+    return len(documents)
+
+
+def _words(query):
+    return re.findall(r"\w+", query)
+
+
+# Every word must match, as a prefix, so "pyth djan" finds "Python & Django".
+
+def _fts5_query(query):
+    return " ".join('"%s"*' % word for word in _words(query))
+
+
+def _tsquery(query):
+    # For to_tsquery(): \w+ words are plain lexemes, so nothing needs quoting.
+    return " & ".join(f"{word}:*" for word in _words(query))
+
+
+def _ranked_ids(query, courses, limit):
+    # `courses` is applied in the same statement, before the LIMIT.
+    allowed, allowed_params = courses.order_by().values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            match = _tsquery(query)
+            if not match:
+                return []
+            cursor.execute(
+                f"""
+                SELECT course_id FROM api_coursesearchdocument, to_tsquery('english', %s) query
+                WHERE document @@ query AND course_id IN ({allowed})
+                ORDER BY ts_rank_cd(document, query) DESC, course_id
+                LIMIT %s
+                """,
+                [match, *allowed_params, limit],
+            )
+        elif connection.vendor == "sqlite":
+            match = _fts5_query(query)
+            if not match:
+                return []
+            cursor.execute(
+                f"""
+                SELECT rowid FROM api_coursesearchdocument_fts
+                WHERE api_coursesearchdocument_fts MATCH %s AND rowid IN ({allowed})
+                ORDER BY bm25(api_coursesearchdocument_fts, 10.0, 4.0, 4.0, 1.0), rowid
+                LIMIT %s
+                """,
+                [match, *allowed_params, limit],
+            )
+        else:
+            return list(
+                CourseSearchDocument.objects.filter(title__icontains=query, course__in=courses)
+                .values_list("course_id", flat=True)[:limit]
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching(courses, query):
+    """
+    The courses in `courses` matching `query`, unranked and uncapped, as
+    a queryset (for counting facets over every match). An empty query
+    matches them all.
+    """
+    query = (query or "").strip()
+    if not query:
+        return courses
+    if not _words(query):
+        return courses.none()
+    if connection.vendor == "postgresql":
+        match = RawSQL("SELECT course_id FROM api_coursesearchdocument WHERE document @@ to_tsquery('english', %s)", [_tsquery(query)])
+    elif connection.vendor == "sqlite":
+        match = RawSQL(
+            "SELECT rowid FROM api_coursesearchdocument_fts WHERE api_coursesearchdocument_fts MATCH %s", [_fts5_query(query)]
+        )
+    else:
+        return courses.filter(search_document__title__icontains=query)
+    return courses.filter(id__in=match)
+
+
+def search_courses(courses, query, limit=None):
+    """
+    Return the ids of the courses in `courses` matching `query`, best match
+    first, at most `limit` (SEARCH_RESULT_LIMIT) of them. An empty query
+    returns every course, newest first, as the plain title filter this
+    replaced did: as a queryset of ids, so it is paged in SQL rather than
+    loaded.
+    """
+    query = (query or "").strip()
+    if not query:
+        return courses.order_by("-date", "-id").values_list("id", flat=True)
+    return _ranked_ids(query, courses, limit or SEARCH_RESULT_LIMIT)
+
+
+def _marked(text):
+    return escape(text or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def highlight_courses(course_ids, query):
+    """
+    Return {course_id: {"title": ..., "description": ...}} with the matched
+    terms wrapped in <mark>. Only run this for the page being returned.
+    """
+    query = (query or "").strip()
+    if not course_ids or not query:
+        return {}
+
+    if not _words(query):
+        return {}
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                """
+                SELECT course_id,
+                    ts_headline('english', title, query, %s),
+                    ts_headline('english', body, query, %s)
+                FROM api_coursesearchdocument, to_tsquery('english', %s) query
+                WHERE course_id = ANY(%s)
+                """,
+                [
+                    f"StartSel={MARK_START}, StopSel={MARK_END}, HighlightAll=true",
+                    f"StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, MaxWords=20, MinWords=8",
+                    _tsquery(query),
+                    list(course_ids),
+                ],
+            )
+        elif connection.vendor == "sqlite":
+            placeholders = ", ".join(["%s"] * len(course_ids))
+            cursor.execute(
+                f"""
+                SELECT rowid,
+                    highlight(api_coursesearchdocument_fts, 0, %s, %s),
+                    snippet(api_coursesearchdocument_fts, 3, %s, %s, '...', 20)
+                FROM api_coursesearchdocument_fts
+                WHERE api_coursesearchdocument_fts MATCH %s AND rowid IN ({placeholders})
+                """,
+                [MARK_START, MARK_END, MARK_START, MARK_END, _fts5_query(query), *course_ids],
+            )
+        else:
+            return {}
+        return {
+            course_id: {"title": _marked(title), "description": _marked(description)}
+            for course_id, title, description in cursor.fetchall()
+        }
+
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or INDEXED_FIELDS & set(update_fields):
+        index_courses(Course.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def index_category_courses(sender, instance, created, **kwargs):
+    if not created:
+        index_courses(Course.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Teacher)
+def index_teacher_courses(sender, instance, created, **kwargs):
+    if not created:
+        index_courses(Course.objects.filter(teacher=instance))
@@ -1,12 +1,211 @@
+import copy
+
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from django.urls import reverse
 
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.utils.field_mapping import get_nested_relation_kwargs
 from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from userauths.models import Profile, User
-from api.models import CompletedLesson, EnrolledCourse, Note, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, Review, Notification, Coupon, Wishlist, Question_Answer, Question_Answer_Message
+from api import direct_uploads, images, uploads
+from api.models import CompletedLesson, EnrolledCourse, Note, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, Review, Notification, Coupon, Wishlist, Question_Answer, Question_Answer_Message, ChunkedUpload
+
+
+
+def _field_paths(value):
+    # "title,curriculum.title,curriculum.variant_items" ->
+    # {"title": {}, "curriculum": {"title": {}, "variant_items": {}}}
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class ExpandableFieldsMixin:
+    """
+    Let GET requests choose the shape of the response:
+
+        ?fields=title,price,curriculum.title
+        ?include=category,curriculum.variant_items
+
+    `fields` keeps only the listed fields; dotted paths select inside nested
+    objects. `include`, when present, expands only the listed relations
+    (again dotted for nested ones): any other relation is returned as its
+    primary key(s), or left out if it is not a model relation (e.g.
+    `students`). Without either parameter the full nested representation
+    is returned. Use `expansion_lookups()` to prefetch for the chosen shape.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, include = self.field_selection()
+
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        if include is not None:
+            for name, field in list(fields.items()):
+                if name in include or not isinstance(getattr(field, 'child', field), serializers.BaseSerializer):
+                    continue
+                collapsed = self.collapse_field(name, field)
+                if collapsed is None:
+                    del fields[name]
+                else:
+                    fields[name] = collapsed
+
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, ExpandableFieldsMixin):
+                nested._field_selection = (
+                    (only or {}).get(name) or None,
+                    None if include is None else include.get(name, {}),
+                )
+        return fields
+
+    def field_selection(self):
+        # Nested serializers get their part of the selection from the parent;
+        # only the top-level one reads the request.
+        if hasattr(self, '_field_selection'):
+            return self._field_selection
+        if self.parent is not None and not (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None):
+            return None, None
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+        params = request.query_params
+        only = _field_paths(params['fields']) if params.get('fields') else None
+        include = _field_paths(params['include']) if 'include' in params else None
+        return only, include
+
+    def collapse_field(self, name, field):
+        source = field.source or name
+        try:
+            model_field = self.Meta.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.is_relation:
+            return None
+        return serializers.PrimaryKeyRelatedField(
+            source=None if source == name else source,
+            read_only=True,
+            many=model_field.many_to_many or model_field.one_to_many,
+        )
+
+
+def expansion_lookups(serializer):
+    """
+    The (select_related, prefetch_related) lookups covering the relations
+    `serializer` will read, after any ?fields= / ?include= selection.
+
+    Fields backed by a model method rather than a relation are followed
+    through the serializer's `prefetch_sources` ({field: lookup}); fields
+    with neither are left to query on their own.
+    """
+    select, prefetch = [], []
+
+    def collect(serializer, prefix, in_many):
+        model = serializer.Meta.model
+        sources = getattr(serializer, 'prefetch_sources', {})
+        for name, field in serializer.fields.items():
+            many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+            nested = getattr(field, 'child', field)
+            if not many and not isinstance(nested, serializers.ModelSerializer):
+                continue
+            source = field.source
+            if source in sources:
+                lookup = sources[source]
+            else:
+                try:
+                    model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    continue
+                lookup = source
+
+            path = prefix + lookup
+            target = prefetch if in_many or many else select
+            if path not in target:
+                target.append(path)
+            if isinstance(nested, serializers.ModelSerializer):
+                collect(nested, path + '__', in_many or many)
+
+    collect(serializer, '', False)
+    return select, prefetch
+
+
+def image_variant_urls(image_variants, source_name, storage, request=None):
+    # {size: {"width", "height", fmt: storage name}} -> the same with URLs.
+    def url(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        size: {key: url(value) if key in images.FORMATS else value for key, value in variant.items()}
+        for size, variant in images.recorded_sizes(image_variants, source_name).items()
+    }
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized copies of the instance's `image` (api/images.py):
+    {"small": {"width": 320, "height": 200, "webp": url, "jpeg": url}, ...},
+    or {} until the media worker has made them.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = instance.image
+        return image_variant_urls(instance.image_variants, image.name, image.storage, self.context.get('request'))
+
+
+class ImageVariantsMixin:
+    # The `image_variants` column (Course, Category, Teacher, Profile) holds
+    # storage names; serialize it as URLs wherever the model is rendered.
+    def build_standard_field(self, field_name, model_field):
+        if field_name == 'image_variants':
+            return ImageVariantsField, {}
+        return super().build_standard_field(field_name, model_field)
+
+
+class CachedFieldsMixin:
+    """
+    Build a ModelSerializer's field map once per class and give each instance
+    a copy of it, instead of introspecting the model (and every nested model,
+    down to Meta.depth) on each instantiation.
+
+    Serializer classes are never changed at runtime: nested reads and flat
+    writes are separate classes (e.g. ReviewSerializer / ReviewWriteSerializer),
+    picked by the view.
+    """
+
+    def get_fields(self):
+        cls = type(self)
+        fields = cls.__dict__.get('_cached_fields')
+        if fields is None:
+            fields = super().get_fields()
+            cls._cached_fields = fields
+        return copy.deepcopy(fields)
+
+    def build_nested_field(self, field_name, relation_info, nested_depth):
+        # Same as ModelSerializer's, with the cache on the generated class too.
+        class NestedSerializer(ExpandableFieldsMixin, ImageVariantsMixin, CachedFieldsMixin, serializers.ModelSerializer):
+            class Meta:
+                model = relation_info.related_model
+                depth = nested_depth - 1
+                fields = '__all__'
+
+        return NestedSerializer, get_nested_relation_kwargs(relation_info)
 
 
 # Define a custom serializer that inherits from TokenObtainPairSerializer
@@ -73,22 +272,12 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', "username", 'email', 'full_name']
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(ExpandableFieldsMixin, ImageVariantsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Profile
         fields = '__all__'
-
-    def __init__(self, *args, **kwargs):
-        super(ProfileSerializer, self).__init__(*args, **kwargs)
-        # Customize serialization depth based on the request method.
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            # When creating a new product FAQ, set serialization depth to 0.
-            self.Meta.depth = 0
-        else:
-            # For other methods, set serialization depth to 3.
-            self.Meta.depth = 3
+        depth = 3
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
@@ -98,13 +287,51 @@ class ProfileSerializer(serializers.ModelSerializer):
 class PasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(ImageVariantsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = Category
 
-class VariantItemSerializer(serializers.ModelSerializer):
+class LectureStreamURLField(serializers.Field):
+    """The Range-capable streaming URL of a lecture's file (api/streaming.py), or None without a file."""
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, lecture):
+        if not lecture.file:
+            return None
+        url = reverse('lecture-file', kwargs={'lecture_id': lecture.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+class LectureHLSField(serializers.Field):
+    """
+    The lecture's HLS master playlist URL and renditions (api/hls.py):
+    {"url": ..., "renditions": [{"name": "360p", "height": 360, "bandwidth": ...}]},
+    or None until they have been made for the current file.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, lecture):
+        recorded = lecture.hls or {}
+        if not lecture.file or recorded.get('source') != lecture.file.name:
+            return None
+        url = lecture.file.storage.url(recorded['playlist'])
+        request = self.context.get('request')
+        return {
+            'url': request.build_absolute_uri(url) if request is not None else url,
+            'renditions': recorded['renditions'],
+        }
+
+class VariantItemSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
+    stream_url = LectureStreamURLField()
+    hls = LectureHLSField()
 
     class Meta:
         model = VariantItem
@@ -119,34 +346,26 @@ class VariantItemSerializer(serializers.ModelSerializer):
             "date",
             "preview",
             "variant_item_id",
+            "position",
+            "media_status",
+            "stream_url",
+            "hls",
         ]
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(VariantItemSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
-class VariantSerializer(serializers.ModelSerializer):
+class VariantSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     variant_items = VariantItemSerializer(many=True, read_only=True)
     items = VariantItemSerializer(many=True, read_only=True)
+    prefetch_sources = {'items': 'variant_items'}
 
     class Meta:
         model = Variant
         fields = "__all__"
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(VariantSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(many=False, read_only=True)
+    prefetch_sources = {'profile': 'user__profile'}
 
     class Meta:
         model = Review
@@ -161,45 +380,35 @@ class ReviewSerializer(serializers.ModelSerializer):
             "profile",
             "date",
         ]
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(ReviewSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class ReviewWriteSerializer(ReviewSerializer):
+    # POST: related objects as primary keys.
+    class Meta(ReviewSerializer.Meta):
+        depth = 0
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = Cart
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(CartSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class CartWriteSerializer(CartSerializer):
+    # POST: related objects as primary keys.
+    class Meta(CartSerializer.Meta):
+        depth = 0
 
-class CartOrderItemSerializer(serializers.ModelSerializer):
+class CartOrderItemSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = CartOrderItem
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(CartOrderItemSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
-class CartOrderSerializer(serializers.ModelSerializer):
+class CartOrderSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     order_items = CartOrderItemSerializer(many=True)
+    prefetch_sources = {'order_items': 'orderitem'}
     class Meta:
         fields = [
             'teachers',
@@ -220,113 +429,89 @@ class CartOrderSerializer(serializers.ModelSerializer):
             'date',
         ]
         model = CartOrder
+        depth = 3
     
-    def __init__(self, *args, **kwargs):
-        super(CartOrderSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
-
 
+class CartOrderWriteSerializer(CartOrderSerializer):
+    # POST: related objects as primary keys.
+    class Meta(CartOrderSerializer.Meta):
+        depth = 0
 
-class CompletedLessonSerializer(serializers.ModelSerializer):
+class CompletedLessonSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     
     class Meta:
             fields = "__all__"
             model = CompletedLesson
+            depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(CompletedLessonSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
+class CompletedLessonWriteSerializer(CompletedLessonSerializer):
+    # POST: related objects as primary keys.
+    class Meta(CompletedLessonSerializer.Meta):
+        depth = 0
 
-
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     
     class Meta:
             fields = "__all__"
             model = Note
+            depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(NoteSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class NoteWriteSerializer(NoteSerializer):
+    # POST: related objects as primary keys.
+    class Meta(NoteSerializer.Meta):
+        depth = 0
 
-class Question_Answer_MessageSerializer(serializers.ModelSerializer):
+class Question_Answer_MessageSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(many=False, read_only=True)
+    prefetch_sources = {'profile': 'user__profile'}
 
     class Meta:
             fields = "__all__"
             model = Question_Answer_Message
+            depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(Question_Answer_MessageSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
 
 
 
 
-class Question_AnswerSerializer(serializers.ModelSerializer):
+class Question_AnswerSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     messages = Question_Answer_MessageSerializer(many=True)
     profile = ProfileSerializer(many=False, read_only=True)
+    prefetch_sources = {'messages': 'question_answer_message_set', 'profile': 'user__profile'}
 
     class Meta:
             fields = "__all__"
             model = Question_Answer
+            depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(Question_AnswerSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
-
-
+class Question_AnswerWriteSerializer(Question_AnswerSerializer):
+    # POST: related objects as primary keys.
+    class Meta(Question_AnswerSerializer.Meta):
+        depth = 0
 
-
-
-class EnrolledCourseSerializer(serializers.ModelSerializer):
+class EnrolledCourseSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     lectures = VariantItemSerializer(many=True, read_only=True)
     completed_lesson = CompletedLessonSerializer(many=True, read_only=True)
     curriculum = VariantSerializer(many=True, read_only=True)
     note = NoteSerializer(many=True, read_only=True)
     question_answer = Question_AnswerSerializer(many=True, read_only=True)
     review = ReviewSerializer(many=False, read_only=True)
+    prefetch_sources = {'curriculum': 'course__variant_set'}
 
     class Meta:
             fields = "__all__"
             model = EnrolledCourse
+            depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(EnrolledCourseSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
 
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(ExpandableFieldsMixin, ImageVariantsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     students = EnrolledCourseSerializer(many=True, required=False)
     curriculum = VariantSerializer(many=True, required=False)
     lectures = VariantItemSerializer(many=True, required=False)
     variant = VariantSerializer(many=True, required=False)
+    prefetch_sources = {'students': 'enrolledcourse_set', 'curriculum': 'variant_set', 'variant': 'variant_set'}
 
     class Meta:
         model = Course
@@ -335,6 +520,7 @@ class CourseSerializer(serializers.ModelSerializer):
             'category',
             'teacher',
             'image',
+            'image_variants',
             'file',
             'title',
             'description',
@@ -356,16 +542,252 @@ class CourseSerializer(serializers.ModelSerializer):
             'variant',
             'date',
         ]
+        read_only_fields = ['rating', 'average_rating', 'rating_count']
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(CourseSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class CourseWriteSerializer(CourseSerializer):
+    # POST: related objects as primary keys.
+    class Meta(CourseSerializer.Meta):
+        depth = 0
+
+class CurriculumSectionSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
+    lectures = serializers.PrimaryKeyRelatedField(source='variant_items', many=True, read_only=True)
+
+    class Meta:
+        model = Variant
+        fields = ['id', 'variant_id', 'title', 'position', 'date', 'lectures']
+
+class CurriculumLectureSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
+    stream_url = LectureStreamURLField()
+    hls = LectureHLSField()
+
+    class Meta:
+        model = VariantItem
+        fields = VariantItemSerializer.Meta.fields
+
+class LectureFileInputField(serializers.Field):
+    # Multipart course forms send a new upload, "null" to remove the file,
+    # or the current file's URL to leave it alone (the key is then omitted).
+    def to_internal_value(self, data):
+        if data in (None, "", "null"):
+            return None
+        if isinstance(data, str):
+            raise serializers.SkipField()
+        if not hasattr(data, "read"):
+            raise serializers.ValidationError("Expected a file upload.")
+        return data
+
+class CurriculumLectureInputSerializer(serializers.Serializer):
+    variant_item_id = serializers.CharField(max_length=25, required=False, allow_blank=True)
+    title = serializers.CharField(max_length=1000, required=False, allow_blank=True, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    file = LectureFileInputField(required=False)
+    preview = serializers.BooleanField(required=False, default=False)
+
+class CurriculumSectionInputSerializer(serializers.Serializer):
+    # `variant_id` is the section's primary key when it already exists.
+    variant_id = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    variant_title = serializers.CharField(max_length=1000, allow_blank=True)
+    items = CurriculumLectureInputSerializer(many=True, required=False, default=list)
+
+class CurriculumInputSerializer(serializers.Serializer):
+    # The `variants[0][items][1][title]` keys of the course create/update
+    # forms, nested by api.parsers.nested_form_data. Left out of
+    # validated_data when the form has none, i.e. leaves the curriculum alone.
+    variants = CurriculumSectionInputSerializer(many=True, required=False)
+
+class CurriculumOperationSerializer(serializers.Serializer):
+    # One edit of api.curriculum.apply_operations. `id` and `section` are
+    # primary keys; `position` defaults to last.
+    op = serializers.ChoiceField(choices=["insert", "move", "rename", "delete"])
+    type = serializers.ChoiceField(choices=["section", "lecture"])
+    id = serializers.IntegerField(required=False)
+    section = serializers.IntegerField(required=False)
+    position = serializers.IntegerField(min_value=0, required=False)
+    title = serializers.CharField(max_length=1000, required=False, allow_blank=True, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    preview = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] != "insert" and "id" not in attrs:
+            raise serializers.ValidationError({"id": f"Required to {attrs['op']} a {attrs['type']}."})
+        if attrs["op"] == "insert" and attrs["type"] == "lecture" and "section" not in attrs:
+            raise serializers.ValidationError({"section": "Required to insert a lecture."})
+        if attrs["type"] == "section" and ("description" in attrs or "preview" in attrs):
+            raise serializers.ValidationError("Sections only have a title.")
+        return attrs
+
+class CurriculumOperationsSerializer(serializers.Serializer):
+    operations = CurriculumOperationSerializer(many=True, allow_empty=False)
+
+class CourseStudentSerializer(EnrolledCourseSerializer):
+    # The course's lectures and curriculum are on the course itself.
+    lectures = None
+    curriculum = None
+    prefetch_sources = {}
+
+class CourseDetailSerializer(CourseSerializer):
+    """
+    Version 2 of the course detail (?version=2). Version 1 repeats every
+    lecture in `curriculum`, `variant` and `lectures`, twice per section
+    (`variant_items` and `items`), and again for each enrolled student. Here
+    `lectures` lists each lecture once and the `curriculum` sections refer to
+    them by id; `variant` is gone and students carry no course content.
+    """
+    students = CourseStudentSerializer(many=True, read_only=True)
+    curriculum = CurriculumSectionSerializer(many=True, read_only=True)
+    lectures = CurriculumLectureSerializer(many=True, read_only=True)
+    variant = None
+    prefetch_sources = {'students': 'enrolledcourse_set', 'curriculum': 'variant_set'}
+
+    class Meta(CourseSerializer.Meta):
+        fields = [field for field in CourseSerializer.Meta.fields if field != 'variant']
+
+class CourseListTeacherSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Teacher
+        fields = ['id', 'image', 'image_variants', 'full_name', 'bio', 'facebook', 'twitter', 'linkedin', 'about', 'country']
+
+class CourseListProfileSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Profile
+        fields = ['id', 'image', 'image_variants', 'full_name', 'country']
+
+class CourseListReviewSerializer(serializers.ModelSerializer):
+    profile = CourseListProfileSerializer(source='user.profile', read_only=True, allow_null=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'user', 'review', 'rating', 'reply', 'active', 'profile', 'date']
+
+class CourseListVariantItemSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = VariantItem
+        fields = ['id', 'title', 'description', 'file', 'duration', 'content_duration', 'date', 'preview', 'variant_item_id']
+
+class CourseListVariantSerializer(serializers.ModelSerializer):
+    variant_items = CourseListVariantItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Variant
+        fields = ['id', 'title', 'variant_id', 'variant_items', 'date']
+
+class CourseListSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    """
+    Read-only course serializer for listings.
+
+    Expects the queryset from `api.views.course_listing_queryset`: related rows
+    come out of the select_related/prefetch caches and the stats are columns on
+    the course row, so a page costs the same number of queries whatever its size.
+    """
+    category = CategorySerializer(read_only=True)
+    teacher = CourseListTeacherSerializer(read_only=True)
+    curriculum = CourseListVariantSerializer(many=True, read_only=True)
+    reviews = CourseListReviewSerializer(source='active_reviews', many=True, read_only=True)
 
-class TeacherSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Course
+        fields = [
+            'id',
+            'category',
+            'teacher',
+            'image',
+            'image_variants',
+            'file',
+            'title',
+            'description',
+            'price',
+            'level',
+            'language',
+            'platform_status',
+            'teacher_course_status',
+            'featured',
+            'rating',
+            'course_id',
+            'slug',
+            'average_rating',
+            'rating_count',
+            'student_count',
+            'lecture_count',
+            'lecture_duration',
+            'curriculum',
+            'reviews',
+            'date',
+        ]
+        read_only_fields = fields
+
+class CourseCardSerializer(serializers.Serializer):
+    """
+    Course card for catalog, search and wishlist listings.
+
+    Works on the rows from `api.views.course_card_queryset` (plain dicts from
+    `.values()`, never model instances) and builds each card in one pass; the
+    declared fields only describe the shape for the API docs.
+    """
+    id = serializers.IntegerField()
+    course_id = serializers.CharField()
+    slug = serializers.SlugField()
+    title = serializers.CharField()
+    image = serializers.CharField()
+    image_variants = serializers.DictField()
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    level = serializers.CharField()
+    language = serializers.CharField()
+    featured = serializers.BooleanField()
+    teacher = serializers.DictField()
+    category = serializers.DictField()
+    average_rating = serializers.FloatField()
+    rating_count = serializers.IntegerField()
+    date = serializers.DateTimeField()
+
+    def to_representation(self, row):
+        request = self.context.get('request')
+        image = default_storage.url(row['image']) if row['image'] else None
+        if image and request is not None:
+            image = request.build_absolute_uri(image)
+
+        return {
+            'id': row['id'],
+            'course_id': row['course_id'],
+            'slug': row['slug'],
+            'title': row['title'],
+            'image': image,
+            'image_variants': image_variant_urls(row['image_variants'], row['image'], default_storage, request),
+            'price': str(row['price']),
+            'level': row['level'],
+            'language': row['language'],
+            'featured': row['featured'],
+            'teacher': {'id': row['teacher_id'], 'full_name': row['teacher__full_name']},
+            'category': {'title': row['category__title'], 'slug': row['category__slug']} if row['category__title'] else None,
+            'average_rating': row['average_rating'],
+            'rating_count': row['rating_count'],
+            'date': self.fields['date'].to_representation(row['date']),
+        }
+
+class CourseSearchResultSerializer(CourseCardSerializer):
+    highlight = serializers.DictField()
+
+    def to_representation(self, row):
+        card = super().to_representation(row)
+        card['highlight'] = row['highlight']
+        return card
+
+class WishlistCardSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    user = serializers.IntegerField()
+    course = CourseCardSerializer()
+
+    def to_representation(self, row):
+        return {
+            'id': row['wishlist_id'],
+            'user': row['wishlist_user_id'],
+            'course': self.fields['course'].to_representation(row),
+        }
+
+class TeacherSerializer(ExpandableFieldsMixin, ImageVariantsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     students = UserSerializer(many=True)
     courses = CourseSerializer(many=True)
@@ -375,6 +797,7 @@ class TeacherSerializer(serializers.ModelSerializer):
         fields = [
             'user',
             'image',
+            'image_variants',
             'full_name',
             'bio',
             'facebook',
@@ -387,59 +810,39 @@ class TeacherSerializer(serializers.ModelSerializer):
             'review'
         ]
         model = Teacher
+        depth = 2
 
-    def __init__(self, *args, **kwargs):
-        super(TeacherSerializer, self).__init__(*args, **kwargs)
-        # Customize serialization depth based on the request method.
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            # When creating a new product, set serialization depth to 0.
-            self.Meta.depth = 0
-        else:
-            # For other methods, set serialization depth to 3.
-            self.Meta.depth = 2
-
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = Notification
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(NotificationSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class NotificationWriteSerializer(NotificationSerializer):
+    # POST: related objects as primary keys.
+    class Meta(NotificationSerializer.Meta):
+        depth = 0
 
-class CouponSerializer(serializers.ModelSerializer):
+class CouponSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = Coupon
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(CouponSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
+class CouponWriteSerializer(CouponSerializer):
+    # POST: related objects as primary keys.
+    class Meta(CouponSerializer.Meta):
+        depth = 0
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(ExpandableFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = "__all__"
         model = Wishlist
+        depth = 3
 
-    def __init__(self, *args, **kwargs):
-        super(WishlistSerializer, self).__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.method == 'POST':
-            self.Meta.depth = 0
-        else:
-            self.Meta.depth = 3
 
 
 class StudentSummarySerializer(serializers.Serializer):
@@ -453,4 +856,37 @@ class TeacherSummarySerializer(serializers.Serializer):
     total_courses = serializers.IntegerField(default=0)
     total_students = serializers.IntegerField(default=0)
     total_revenue = serializers.IntegerField(default=0)
-    monthly_revenue = serializers.IntegerField(default=0)
\ No newline at end of file
+    monthly_revenue = serializers.IntegerField(default=0)
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    # A suggested PUT size; any chunk size works.
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ["upload_id", "variant_item", "filename", "size", "offset", "status", "chunk_size", "date"]
+        read_only_fields = ["offset", "status"]
+        extra_kwargs = {"variant_item": {"required": True, "allow_null": False}}
+
+    def get_chunk_size(self, obj):
+        return uploads.CHUNK_SIZE
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("The file is empty.")
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files can be at most {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=sorted(direct_uploads.TARGETS))
+    object_id = serializers.IntegerField()
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=255, required=False)
+
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    token = serializers.CharField()
@@ -0,0 +1,47 @@
+"""
+Cold start timing: django.setup() plus the URLconf import, measured in a
+fresh interpreter (the current process has already paid for it). Checked
+against STARTUP_BUDGET_MS by api/tests.py and `manage.py check_startup`.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+
+# Imported on first use only; loading any of them at startup is a regression.
+LAZY_MODULES = ("stripe", "boto3", "moviepy")
+
+SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+class StartupError(Exception):
+    pass
+
+
+def measure(serverless=False):
+    """{"ms": setup + URLconf time, "loaded": the LAZY_MODULES imported by then} for one fresh start."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    if serverless:
+        env["SERVERLESS"] = "1"
+    result = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise StartupError(f"Startup failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def best_of(runs, serverless=False):
+    """The fastest of `runs` starts (timings are noisy upwards only), and what the first one loaded."""
+    results = [measure(serverless) for _ in range(runs)]
+    return min(result["ms"] for result in results), results[0]["loaded"]
@@ -0,0 +1,158 @@
+"""
+Byte-range responses for stored media (lecture videos).
+
+`file_response(request, field_file)` answers GET/HEAD with Range/If-Range
+and the usual conditional headers. Where possible the bytes never pass
+through Python:
+
+- MEDIA_X_ACCEL_REDIRECT (an nginx `internal` location mapped onto
+  MEDIA_ROOT, e.g. "/protected-media/") or MEDIA_X_SENDFILE (Apache
+  mod_xsendfile, lighttpd) hand the file to the web server, which does the
+  ranges itself;
+- files in remote storage (S3) are redirected to, since the storage serves
+  ranges already;
+- a whole local file goes out through FileResponse, i.e. the server's
+  wsgi.file_wrapper / sendfile.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """
+    The (start, end) byte offsets, inclusive, asked for by a single-range
+    `Range` header; None to ignore the header and send everything; or
+    ValueError if no byte of the file is in range (416).
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if match is None:
+        # Malformed, another unit, or several ranges: a full response is allowed.
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if size == 0:
+        # An empty file has no byte to send.
+        raise ValueError(header)
+    if not start:
+        # "bytes=-500": the last 500 bytes.
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.META.get("HTTP_IF_RANGE")
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+class RangeFile:
+    """A file object limited to `length` bytes from its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _local_path(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def _server_response(path, name, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_X_ACCEL_REDIRECT:
+        response["X-Accel-Redirect"] = settings.MEDIA_X_ACCEL_REDIRECT.rstrip("/") + "/" + quote(name)
+    else:
+        response["X-Sendfile"] = path
+    return response
+
+
+def file_response(request, field_file):
+    name = field_file.name
+    path = _local_path(field_file)
+    if path is None:
+        return HttpResponseRedirect(field_file.url)
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if settings.MEDIA_X_ACCEL_REDIRECT or settings.MEDIA_X_SENDFILE:
+        return _server_response(path, name, content_type)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    byte_range = None
+    if "HTTP_RANGE" in request.META and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META["HTTP_RANGE"], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            response["Accept-Ranges"] = "bytes"
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+    else:
+        file = open(path, "rb")
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            # No fileno: the server can't sendfile past the range.
+            file.seek(start)
+            response = FileResponse(RangeFile(file, length), content_type=content_type)
+        response.block_size = BLOCK_SIZE
+
+    if byte_range is not None:
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -1,3 +1,900 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import boto3
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from moto import mock_s3
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from api import blobs, direct_uploads, hls, images, media, mediainfo, search, startup
+from api import cache as api_cache
+from api.curriculum import update_curriculum
+from api.management.commands.benchmark_curriculum_parser import Command as BenchmarkCurriculumParser, scan_per_section
+from api.models import (
+    Category, Course, CourseSearchDocument, EnrolledCourse, MediaBlob, MediaJob, Review, Teacher, Variant, VariantItem,
+    Wishlist, rebuild_course_stats,
+)
+from api.pagination import DateCursorPagination
+from api.parsers import nested_form_data
+from userauths.models import User
+
+
+def create_course(sections=2, lectures=3, title="Python for beginners", category="Programming"):
+    """A published course with `sections` sections of `lectures` lectures each."""
+    user = User.objects.create(email=f"teacher{User.objects.count()}@example.com", username=f"teacher{User.objects.count()}")
+    teacher = Teacher.objects.create(user=user, full_name="Ada Teacher", country="NG")
+    category, _ = Category.objects.get_or_create(title=category)
+    course = Course.objects.create(
+        teacher=teacher, category=category, title=title, description="<p>Learn python</p>",
+        price=10, platform_status="Published", teacher_course_status="Published",
+    )
+    for section in range(sections):
+        variant = Variant.objects.create(course=course, title=f"Section {section}")
+        VariantItem.objects.bulk_create([
+            VariantItem(variant=variant, position=index, title=f"Lecture {section}.{index}", description="Notes " * 20)
+            for index in range(lectures)
+        ])
+    return course
+
+
+class NestedFormDataTests(SimpleTestCase):
+    def form(self, *pairs):
+        data = QueryDict(mutable=True)
+        for key, value in pairs:
+            data[key] = value
+        return data
+
+    def test_nests_brackets(self):
+        nested = nested_form_data(self.form(
+            ("title", "Course"),
+            ("variants[0][variant_title]", "Intro"),
+            ("variants[0][items][0][title]", "Welcome"),
+            ("variants[0][items][0][preview]", "true"),
+        ))
+        self.assertEqual(nested, {
+            "title": "Course",
+            "variants": [{"variant_title": "Intro", "items": [{"title": "Welcome", "preview": "true"}]}],
+        })
+
+    def test_gaps_and_unordered_indexes(self):
+        nested = nested_form_data(self.form(
+            ("variants[10][variant_title]", "Last"),
+            ("variants[2][variant_title]", "First"),
+            ("variants[2][items][5][title]", "B"),
+            ("variants[2][items][1][title]", "A"),
+        ))
+        self.assertEqual(nested["variants"], [
+            {"variant_title": "First", "items": [{"title": "A"}, {"title": "B"}]},
+            {"variant_title": "Last"},
+        ])
+
+    def test_keeps_file_values(self):
+        upload = SimpleUploadedFile("intro.mp4", b"video", "video/mp4")
+        nested = nested_form_data(self.form(("variants[0][items][0][file]", upload)))
+        self.assertIs(nested["variants"][0]["items"][0]["file"], upload)
+
+    def test_malformed_keys_are_kept_as_they_are(self):
+        nested = nested_form_data(self.form(("variants[0][items", "x"), ("variants]0[", "y"), ("[0]", "z")))
+        self.assertEqual(nested, {"variants[0][items": "x", "variants]0[": "y", "[0]": "z"})
+
+    def test_conflicting_keys(self):
+        for pairs in (
+            (("variants[0]", "x"), ("variants[0][title]", "Intro")),
+            (("variants[0][title]", "Intro"), ("variants[0]", "x")),
+        ):
+            with self.assertRaises(ParseError):
+                nested_form_data(self.form(*pairs))
+
+    def test_matches_per_section_scans(self):
+        data = BenchmarkCurriculumParser().form(sections=3, lectures=4)
+        for key in [key for key in data if key.endswith("[variant_id]")]:
+            # The old scans didn't read it.
+            del data[key]
+        nested = nested_form_data(data)
+        self.assertEqual(nested["variants"], scan_per_section(data))
+
+
+class StartupBudgetTests(SimpleTestCase):
+    # Best of 3 fresh interpreters against STARTUP_BUDGET_MS.
+    def assertWithinBudget(self, serverless):
+        best, loaded = startup.best_of(3, serverless)
+        self.assertEqual(loaded, [], "imported at startup but should load lazily")
+        self.assertLessEqual(best, settings.STARTUP_BUDGET_MS, f"startup took {best:.0f} ms")
+
+    def test_startup_within_budget(self):
+        self.assertWithinBudget(serverless=False)
+
+    def test_serverless_startup_within_budget(self):
+        self.assertWithinBudget(serverless=True)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.courses = [create_course(sections=0, title=f"Course {index}") for index in range(6)]
+        # Five of the six share a date, so the page boundary falls inside the tie.
+        tied = self.courses[0].date
+        Course.objects.filter(pk__in=[course.pk for course in self.courses[1:]]).update(date=tied)
+
+    def walk(self, url, **params):
+        pages, response = [], self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.json()["results"]])
+            if not response.json()["next"]:
+                return pages
+            response = self.client.get(response.json()["next"])
+
+    def test_tied_dates_across_pages(self):
+        pages = self.walk("/api/v1/course/course-list/", page_size=3)
+        self.assertEqual([len(page) for page in pages], [3, 3])
+        expected = list(Course.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_page_size_is_clamped(self):
+        with mock.patch.object(DateCursorPagination, "max_page_size", 4):
+            pages = self.walk("/api/v1/course/course-list/", page_size=50)
+        self.assertEqual([len(page) for page in pages], [4, 2])
+
+    def test_wishlist_cursor_ordering(self):
+        user = User.objects.create(email="student@example.com", username="student")
+        wishlist = [Wishlist.objects.create(user=user, course=course) for course in self.courses[:5]]
+        newest_first = [entry.pk for entry in reversed(wishlist)]
+        pages = self.walk(f"/api/v1/student/wishlist/{user.pk}/", page_size=2)
+        self.assertEqual(pages, [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = create_course(sections=0, title="Python and Django")
+        cls.rust = create_course(sections=0, title="Rust for systems")
+        cls.draft = create_course(sections=0, title="Python drafts")
+        Course.objects.filter(pk=cls.draft.pk).update(platform_status="Draft")
+        cls.published = Course.objects.filter(platform_status="Published", teacher_course_status="Published")
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        response = self.client.get("/api/v1/course/search/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def results(self, **params):
+        return [card["id"] for card in self.search(**params)["results"]]
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.results(query="pyth djan"), [self.python.pk])
+
+    def test_empty_query_lists_published_courses(self):
+        expected = {self.python.pk, self.rust.pk}
+        self.assertEqual(set(self.results(query="")), expected)
+        self.assertEqual(set(self.results()), expected)
+
+    def test_empty_query_pages_in_sql(self):
+        newest = create_course(sections=0, title="Go in practice")
+        with self.assertNumQueries(1, using="default") as context:
+            page = search.search_courses(self.published, "")[:1]
+            self.assertEqual(list(page), [newest.pk])
+        self.assertIn("LIMIT 1", context.captured_queries[0]["sql"])
+        self.assertEqual(self.search(query="", page_size=1)["count"], 3)
+
+    def test_filters_before_limit(self):
+        # The draft ranks first for "python drafts" but isn't searchable.
+        self.assertEqual(search.search_courses(self.published, "python", limit=1), [self.python.pk])
+
+    def test_facet_filters_apply_before_limit(self):
+        design = create_course(sections=0, title="Python for designers", category="Design")
+        with mock.patch("api.search.SEARCH_RESULT_LIMIT", 1):
+            response = self.search(query="python", category="design")
+        self.assertEqual([card["id"] for card in response["results"]], [design.pk])
+        # Counted over every match of the query (every description says
+        # "Learn python"), not the capped results.
+        counts = {entry["value"]: entry["count"] for entry in response["facets"]["category"]}
+        self.assertEqual(counts, {"design": 1, "programming": 2})
+
+    def test_stats_saves_skip_reindex(self):
+        CourseSearchDocument.objects.filter(pk=self.rust.pk).update(title="stale")
+        self.rust.student_count = 5
+        self.rust.save(update_fields=["student_count"])
+        self.assertEqual(CourseSearchDocument.objects.get(pk=self.rust.pk).title, "stale")
+        self.rust.save(update_fields=["title"])
+        self.assertEqual(CourseSearchDocument.objects.get(pk=self.rust.pk).title, "Rust for systems")
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = create_course(sections=1, lectures=1)
+        self.other = create_course(sections=1, lectures=1, title="Django for beginners", category="Web")
+        self.student = User.objects.create(email="student@example.com", username="student")
+
+    def detail(self, course):
+        response = self.client.get(f"/api/v1/course/course-detail/{course.slug}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def cards(self):
+        response = self.client.get("/api/v1/course/course-list/")
+        self.assertEqual(response.status_code, 200)
+        return {card["id"]: card for card in response.json()["results"]}
+
+    def write(self, func):
+        # Fill the cache, write, and check the other course's detail is still served from it.
+        self.cards(), self.detail(self.course), self.detail(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+        Course.objects.filter(pk=self.other.pk).update(title="Changed behind the cache")
+        self.assertEqual(self.detail(self.other)["title"], "Django for beginners")
+
+    def test_review_write(self):
+        self.write(lambda: Review.objects.create(user=self.student, course=self.course, review="Good", rating=5, active=True))
+        self.assertEqual(self.cards()[self.course.pk]["rating_count"], 1)
+        self.assertEqual(self.detail(self.course)["rating_count"], 1)
+
+    def test_lecture_write(self):
+        lecture = self.course.lectures().get()
+        lecture.title = "Renamed"
+        self.write(lecture.save)
+        self.assertEqual(self.detail(self.course)["curriculum"][0]["variant_items"][0]["title"], "Renamed")
+
+    def test_category_write(self):
+        category = self.course.category
+        category.title = "Software"
+        self.write(category.save)
+        self.assertEqual(self.cards()[self.course.pk]["category"]["title"], "Software")
+        self.assertEqual(self.detail(self.course)["category"]["title"], "Software")
+
+    def test_lecture_with_cached_section_needs_no_query(self):
+        lecture = VariantItem.objects.select_related("variant").get(variant__course=self.course)
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(0):
+            api_cache._lecture_changed(VariantItem, lecture)
+        self.assertEqual(len(callbacks), 1)
+
+
+class CourseDetailVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = create_course(sections=20, lectures=10)
+        for index in range(3):
+            student = User.objects.create(email=f"student{index}@example.com", username=f"student{index}")
+            EnrolledCourse.objects.create(course=cls.course, user=student, teacher=cls.course.teacher)
+
+    def assertShrinks(self, url):
+        version1 = self.client.get(url, {"version": "1"})
+        version2 = self.client.get(url, {"version": "2"})
+        self.assertEqual((version1.status_code, version2.status_code), (200, 200))
+        self.assertEqual(len(version2.json()["lectures"]), 200)
+        # Version 1 repeats each lecture four times per course and again per student.
+        self.assertLess(len(version2.content) * 10, len(version1.content))
+
+    def test_course_detail_v2_is_smaller(self):
+        self.assertShrinks(f"/api/v1/course/course-detail/{self.course.slug}/")
+
+    def test_teacher_course_detail_v2_is_smaller(self):
+        self.assertShrinks(f"/api/v1/teacher/course-detail/{self.course.course_id}/")
+
+
+class LectureFileTests(TestCase):
+    data = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.lecture = create_course(sections=1, lectures=1).lectures().get()
+        self.url = f"/api/v1/course/lecture-file/{self.lecture.pk}/"
+        self.store(self.data)
+
+    def store(self, data):
+        os.makedirs(os.path.join(self.media_root, "lectures"), exist_ok=True)
+        with open(os.path.join(self.media_root, "lectures", "clip.mp4"), "wb") as file:
+            file.write(data)
+        VariantItem.objects.filter(pk=self.lecture.pk).update(file="lectures/clip.mp4")
+
+    def get(self, byte_range=None, **headers):
+        if byte_range is not None:
+            headers["HTTP_RANGE"] = byte_range
+        return self.client.get(self.url, **headers)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def assertPartial(self, response, start, end):
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{len(self.data)}")
+        self.assertEqual(response["Content-Length"], str(end - start + 1))
+        self.assertEqual(self.body(response), self.data[start:end + 1])
+
+    def test_ranges(self):
+        self.assertPartial(self.get("bytes=10-19"), 10, 19)
+        self.assertPartial(self.get("bytes=-100"), 924, 1023)
+        self.assertPartial(self.get("bytes=-5000"), 0, 1023)
+        self.assertPartial(self.get("bytes=1000-"), 1000, 1023)
+        self.assertPartial(self.get("bytes=1000-9999"), 1000, 1023)
+
+    def test_unsatisfiable_range(self):
+        for byte_range in ("bytes=1024-", "bytes=5000-6000", "bytes=-0", "bytes=20-10"):
+            response = self.get(byte_range)
+            self.assertEqual(response.status_code, 416, byte_range)
+            self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_empty_file(self):
+        self.store(b"")
+        for byte_range in ("bytes=0-", "bytes=-100", "bytes=0-0"):
+            response = self.get(byte_range)
+            self.assertEqual(response.status_code, 416, byte_range)
+            self.assertEqual(response["Content-Range"], "bytes */0")
+        response = self.get()
+        self.assertEqual((response.status_code, response["Content-Length"]), (200, "0"))
+
+    def test_if_range(self):
+        etag = self.get()["ETag"]
+        self.assertPartial(self.get("bytes=0-9", HTTP_IF_RANGE=etag), 0, 9)
+        # A stale validator: the whole (changed) file instead of a piece of it.
+        response = self.get("bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+
+    def test_head(self):
+        response = self.client.head(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual((response["Content-Range"], response["Content-Length"]), ("bytes 10-19/1024", "10"))
+        self.assertEqual(response.content, b"")
+        response = self.client.head(self.url)
+        self.assertEqual((response.status_code, response["Content-Length"]), (200, "1024"))
+
+    def test_multiple_ranges_send_everything(self):
+        response = self.get("bytes=0-9,20-29")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Content-Range", response)
+        self.assertEqual(self.body(response), self.data)
+
+
+class MediaJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.lecture = create_course(sections=1, lectures=1).lectures().get()
+        os.makedirs(os.path.join(self.media_root, "lectures"))
+        with open(os.path.join(self.media_root, "lectures", "notes.mp4"), "wb") as file:
+            file.write(b"not really a video")
+        VariantItem.objects.filter(pk=self.lecture.pk).update(file="lectures/notes.mp4", media_status="processing")
+
+    def run_jobs(self, kind):
+        # Every job here fails.
+        MediaJob.enqueue(kind, self.lecture)
+        with self.assertLogs("api.media", "ERROR"):
+            for job in media.claim_jobs(10):
+                media.run_job(job)
+        return MediaJob.objects.get(kind=kind)
+
+    def test_bad_input_fails_on_first_attempt(self):
+        job = self.run_jobs("probe")
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+        self.assertIn("UnreadableMediaError", job.error)
+        self.assertEqual(VariantItem.objects.get(pk=self.lecture.pk).media_status, "failed")
+
+    def test_missing_tools_fail_on_first_attempt(self):
+        with mock.patch("api.mediainfo.ffprobe_binary", return_value=None), \
+                mock.patch("api.mediainfo.ffmpeg_binary", return_value=None):
+            job = self.run_jobs("hls")
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+
+    def test_packaging_error_fails_on_first_attempt(self):
+        with mock.patch("api.media.hls.package", side_effect=hls.PackagingError("no video stream")), \
+                mock.patch("api.media.mediainfo.inspect"):
+            job = self.run_jobs("hls")
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+
+    def test_transient_error_is_retried(self):
+        with mock.patch("api.media.mediainfo.inspect", side_effect=mediainfo.MediaInspectionError("timed out")):
+            job = self.run_jobs("probe")
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertEqual(VariantItem.objects.get(pk=self.lecture.pk).media_status, "processing")
+
+    def test_unreadable_image(self):
+        with self.assertRaises(mediainfo.PermanentMediaError):
+            images.render(os.path.join(self.media_root, "lectures", "notes.mp4"))
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.variant = create_course(sections=1, lectures=0).variant_set.get()
+
+    def lecture(self, content, name="intro.mp4"):
+        return VariantItem.objects.create(
+            variant=self.variant, title=name, file=SimpleUploadedFile(name, content, "video/mp4")
+        )
+
+    def stored(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_same_content_is_stored_once(self):
+        first = self.lecture(b"same take")
+        second = self.lecture(b"same take", name="copy.MP4")
+        blob = MediaBlob.objects.get()
+        self.assertEqual((first.file.name, second.file.name), (blob.file.name, blob.file.name))
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(len([name for _, _, names in os.walk(self.media_root) for name in names]), 1)
+
+    def test_deleting_one_sharer_keeps_the_file(self):
+        first = self.lecture(b"same take")
+        second = self.lecture(b"same take")
+        name = first.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        self.assertTrue(self.stored(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(self.stored(name))
+
+    def test_replacing_a_file_releases_the_old_one(self):
+        lecture = self.lecture(b"first take")
+        old = lecture.file.name
+        lecture.file = SimpleUploadedFile("intro.mp4", b"second take", "video/mp4")
+        with self.captureOnCommitCallbacks(execute=True):
+            lecture.save()
+        self.assertEqual(list(MediaBlob.objects.values_list("file", "refcount")), [(lecture.file.name, 1)])
+        self.assertFalse(self.stored(old))
+
+    def test_release_keeps_a_file_still_in_use(self):
+        # A count that has drifted below the real number of references.
+        first = self.lecture(b"same take")
+        self.lecture(b"same take")
+        MediaBlob.objects.update(refcount=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(MediaBlob.objects.exists())
+        self.assertTrue(self.stored(first.file.name))
+
+    def test_rollback_deletes_files_written_inside(self):
+        kept = self.lecture(b"already stored")
+        with self.assertRaises(RuntimeError):
+            with blobs.atomic():
+                self.lecture(b"already stored")
+                written = self.lecture(b"new take").file.name
+                raise RuntimeError("rolled back")
+        self.assertFalse(self.stored(written))
+        self.assertTrue(self.stored(kept.file.name))
+        self.assertEqual(list(MediaBlob.objects.values_list("file", "refcount")), [(kept.file.name, 1)])
+
+
+class CourseCreateTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.teacher = create_course(sections=0).teacher
+
+    def form(self):
+        return {
+            "title": "New course", "description": "d", "price": 5, "teacher": self.teacher.pk,
+            "level": "Beginner", "language": "English",
+            "variants[0][variant_title]": "Section",
+            "variants[0][items][0][title]": "Lecture",
+            "variants[0][items][0][file]": SimpleUploadedFile("intro.mp4", b"not really a video", "video/mp4"),
+        }
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_stores_lecture_file_once(self):
+        response = self.client.post("/api/v1/teacher/course-create/", self.form())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_rollback_deletes_stored_files(self):
+        courses = Course.objects.count()
+        with mock.patch("api.curriculum.MediaJob.enqueue_many", side_effect=RuntimeError("queue down")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/api/v1/teacher/course-create/", self.form())
+        self.assertEqual(Course.objects.count(), courses)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+
+class ChunkedUploadTests(TestCase):
+    data = b"0123456789" * 100
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        storage = override_settings(MEDIA_ROOT=directory, CHUNKED_UPLOAD_DIR=os.path.join(directory, "chunks"))
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.lecture = create_course(sections=1, lectures=1).lectures().get()
+
+    def create(self):
+        return self.client.post("/api/v1/teacher/lecture-upload/", {
+            "variant_item": self.lecture.pk, "filename": "intro.mp4", "size": len(self.data),
+        })
+
+    def test_chunks_resume_and_finalize(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/v1/teacher/lecture-upload/{response.json()['upload_id']}/"
+
+        first = self.client.put(url, self.data[:600], content_type="application/octet-stream")
+        self.assertEqual(first.json()["offset"], 600)
+        # A chunk that doesn't start at the offset is refused with the offset to resume from.
+        stale = self.client.put(url, self.data[:100], content_type="application/octet-stream", HTTP_CONTENT_RANGE="bytes 0-99/1000")
+        self.assertEqual((stale.status_code, stale.json()["offset"]), (409, 600))
+        self.client.put(url, self.data[600:], content_type="application/octet-stream")
+
+        response = self.client.post(url + "finalize/")
+        self.assertEqual(response.status_code, 200)
+        self.lecture.refresh_from_db()
+        with self.lecture.file.open("rb") as file:
+            self.assertEqual(file.read(), self.data)
+
+    @override_settings(CHUNKED_UPLOADS_ENABLED=False)
+    def test_disabled_without_shared_disk(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 501)
+        self.assertIn("direct-upload", response.json()["message"])
+
+
+class CurriculumOperationsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.course = create_course()
+        self.url = f"/api/v1/teacher/course-update/{self.course.teacher_id}/{self.course.course_id}/curriculum/"
+
+    def test_patch_changes_course_detail_etag(self):
+        detail = f"/api/v1/course/course-detail/{self.course.slug}/"
+        etag = self.client.get(detail)["ETag"]
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        lecture = self.course.lectures().first()
+        variant = Variant.objects.filter(course=self.course).last()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {"operations": [
+                {"op": "rename", "type": "lecture", "id": lecture.pk, "title": "Renamed"},
+                {"op": "move", "type": "lecture", "id": lecture.pk, "section": variant.pk, "position": 0},
+            ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["curriculum"][-1]["variant_items"][0]["title"], "Renamed")
+
+
+class CurriculumUpdateTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.course = create_course(sections=2, lectures=3)
+
+    def submitted(self):
+        """The stored curriculum as the course update form sends it back."""
+        return [
+            {
+                "variant_id": str(variant.pk),
+                "variant_title": variant.title,
+                "items": [
+                    {"variant_item_id": lecture.variant_item_id, "title": lecture.title,
+                     "description": lecture.description, "preview": lecture.preview}
+                    for lecture in variant.variant_items.order_by("position")
+                ],
+            }
+            for variant in Variant.objects.filter(course=self.course).order_by("position")
+        ]
+
+    def update(self, sections):
+        with self.captureOnCommitCallbacks(execute=True):
+            return update_curriculum(self.course, sections)
+
+    def stored(self):
+        return [
+            (variant.title, list(variant.variant_items.order_by("position").values_list("title", flat=True)))
+            for variant in Variant.objects.filter(course=self.course).order_by("position")
+        ]
+
+    def counts(self, sections=(0, 0, 0, 0), lectures=(0, 0, 0, 0, 0)):
+        return {
+            "sections": dict(zip(("created", "updated", "reordered", "deleted"), sections)),
+            "lectures": dict(zip(("created", "updated", "moved", "reordered", "deleted"), lectures)),
+        }
+
+    def test_rename_and_reorder(self):
+        sections = self.submitted()
+        sections.reverse()
+        sections[0]["variant_title"] = "Advanced"
+        sections[0]["items"].reverse()
+        sections[1]["items"][0]["title"] = "Welcome"
+        changes = self.update(sections)
+        self.assertEqual(changes, self.counts(sections=(0, 2, 2, 0), lectures=(0, 3, 0, 2, 0)))
+        self.assertEqual(self.stored(), [
+            ("Advanced", ["Lecture 1.2", "Lecture 1.1", "Lecture 1.0"]),
+            ("Section 0", ["Welcome", "Lecture 0.1", "Lecture 0.2"]),
+        ])
+
+    def test_lecture_edit_bumps_its_section(self):
+        first, second = Variant.objects.filter(course=self.course).order_by("position")
+        sections = self.submitted()
+        sections[0]["items"][1]["title"] = "Renamed"
+        changes = self.update(sections)
+        self.assertEqual(changes, self.counts(lectures=(0, 1, 0, 0, 0)))
+        self.assertGreater(Variant.objects.get(pk=first.pk).updated_at, first.updated_at)
+        self.assertEqual(Variant.objects.get(pk=second.pk).updated_at, second.updated_at)
+
+    def test_move_lecture_across_sections(self):
+        sections = self.submitted()
+        sections[1]["items"].insert(1, sections[0]["items"].pop(0))
+        changes = self.update(sections)
+        # The moved lecture, the two that close its gap and the two it pushes down.
+        self.assertEqual(changes, self.counts(lectures=(0, 5, 1, 4, 0)))
+        self.assertEqual(self.stored(), [
+            ("Section 0", ["Lecture 0.1", "Lecture 0.2"]),
+            ("Section 1", ["Lecture 1.0", "Lecture 0.0", "Lecture 1.1", "Lecture 1.2"]),
+        ])
+
+    def test_omitted_section_keeps_lectures_moved_out(self):
+        sections = self.submitted()
+        removed = sections.pop(0)
+        sections[0]["items"].append(removed["items"][1])
+        changes = self.update(sections)
+        self.assertEqual(changes, self.counts(sections=(0, 1, 1, 1), lectures=(0, 1, 1, 0, 2)))
+        self.assertEqual(self.stored(), [("Section 1", ["Lecture 1.0", "Lecture 1.1", "Lecture 1.2", "Lecture 0.1"])])
+        self.assertEqual(Course.objects.get(pk=self.course.pk).lecture_count, 4)
+
+    def test_duplicate_lecture_id_creates_a_copy(self):
+        sections = self.submitted()
+        sections[0]["items"].insert(1, {**sections[0]["items"][0], "title": "Copy"})
+        original = VariantItem.objects.get(variant_item_id=sections[0]["items"][0]["variant_item_id"])
+        changes = self.update(sections)
+        self.assertEqual(changes, self.counts(lectures=(1, 2, 0, 2, 0)))
+        self.assertEqual(self.stored()[0], ("Section 0", ["Lecture 0.0", "Copy", "Lecture 0.1", "Lecture 0.2"]))
+        self.assertEqual(VariantItem.objects.get(pk=original.pk).title, "Lecture 0.0")
+
+    def test_file_replacement_releases_old_blob(self):
+        sections = self.submitted()
+        sections[0]["items"][0]["file"] = SimpleUploadedFile("intro.mp4", b"first take", "video/mp4")
+        self.assertEqual(self.update(sections), self.counts(lectures=(0, 1, 0, 0, 0)))
+        old = MediaBlob.objects.get()
+        self.assertEqual(old.refcount, 1)
+
+        sections = self.submitted()
+        sections[0]["items"][0]["file"] = SimpleUploadedFile("intro.mp4", b"second take", "video/mp4")
+        self.assertEqual(self.update(sections), self.counts(lectures=(0, 1, 0, 0, 0)))
+        new = MediaBlob.objects.get()
+        self.assertNotEqual(new.pk, old.pk)
+        self.assertEqual(new.refcount, 1)
+        self.assertEqual(VariantItem.objects.get(variant_item_id=sections[0]["items"][0]["variant_item_id"]).file.name, new.file.name)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, old.file.name)))
+
+
+class PositionTests(TestCase):
+    def test_save_appends_to_parent(self):
+        course = create_course(sections=2, lectures=2)
+        variant = Variant.objects.create(course=course, title="Appended")
+        self.assertEqual(variant.position, 2)
+        first = VariantItem.objects.create(variant=variant, title="First")
+        second = VariantItem.objects.create(variant=variant, title="Second")
+        self.assertEqual((first.position, second.position), (0, 1))
+        self.assertEqual(list(course.lectures().values_list("title", flat=True))[-2:], ["First", "Second"])
+
+
+class CourseStatsTests(TestCase):
+    """The denormalized stats columns agree with `rebuild_course_stats` after every write."""
+
+    def setUp(self):
+        self.course = create_course(sections=1, lectures=2)
+        self.other = create_course(sections=1, lectures=1, title="Django for beginners")
+        self.student = User.objects.create(email="student@example.com", username="student")
+        # create_course bulk-creates its lectures, which skips the signals.
+        rebuild_course_stats(Course.objects.all())
+
+    def stats(self):
+        rows = Course.objects.filter(pk__in=[self.course.pk, self.other.pk]).order_by("pk")
+        return [
+            {**row, "average_rating": round(row["average_rating"] or 0, 6)}
+            for row in rows.values(*Course.STATS_FIELDS)
+        ]
+
+    def assertStatsRebuilt(self):
+        current = self.stats()
+        rebuild_course_stats(Course.objects.filter(pk__in=[self.course.pk, self.other.pk]))
+        self.assertEqual(current, self.stats())
+
+    def test_review_writes(self):
+        review = Review.objects.create(user=self.student, course=self.course, review="Good", rating=4, active=True)
+        Review.objects.create(user=self.student, course=self.course, review="Fine", rating=3)
+        self.assertStatsRebuilt()
+        review.rating = 5
+        review.save()
+        self.assertStatsRebuilt()
+        review.active = False
+        review.save()
+        self.assertStatsRebuilt()
+        review.course = self.other
+        review.active = True
+        review.save()
+        self.assertStatsRebuilt()
+        self.assertEqual(Course.objects.get(pk=self.other.pk).rating_count, 1)
+        review.delete()
+        self.assertStatsRebuilt()
+
+    def test_enrollment_writes(self):
+        enrollment = EnrolledCourse.objects.create(course=self.course, user=self.student, teacher=self.course.teacher)
+        EnrolledCourse.objects.create(course=self.course, teacher=self.course.teacher)
+        self.assertStatsRebuilt()
+        self.assertEqual(Course.objects.get(pk=self.course.pk).student_count, 2)
+        enrollment.course = self.other
+        enrollment.save()
+        self.assertStatsRebuilt()
+        enrollment.delete()
+        self.assertStatsRebuilt()
+
+    def test_lecture_writes(self):
+        variant = self.course.variant_set.get()
+        lecture = VariantItem.objects.create(variant=variant, title="Extra", duration=timedelta(minutes=5))
+        self.assertStatsRebuilt()
+        lecture.duration = timedelta(minutes=7)
+        lecture.save()
+        self.assertStatsRebuilt()
+        lecture.variant = self.other.variant_set.get()
+        lecture.save()
+        self.assertStatsRebuilt()
+        self.assertEqual(Course.objects.get(pk=self.other.pk).lecture_count, 2)
+        lecture.delete()
+        self.assertStatsRebuilt()
+
+    def test_course_save_keeps_counters(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        Review.objects.create(user=self.student, course=self.course, review="Good", rating=5, active=True)
+        EnrolledCourse.objects.create(course=self.course, user=self.student, teacher=self.course.teacher)
+        stale.title = "Python, revised"
+        stale.save()
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual((course.title, course.rating_count, course.student_count), ("Python, revised", 1, 1))
+        self.assertStatsRebuilt()
+
+
+@mock_s3
+@override_settings(
+    USE_S3=True,
+    AWS_ACCESS_KEY_ID="testing",
+    AWS_SECRET_ACCESS_KEY="testing",
+    AWS_STORAGE_BUCKET_NAME="lms-media",
+    AWS_S3_REGION_NAME="us-east-1",
+    AWS_S3_FILE_OVERWRITE=False,
+    AWS_DEFAULT_ACL="public-read",
+    AWS_S3_OBJECT_PARAMETERS={"CacheControl": "max-age=86400"},
+    AWS_LOCATION="static",
+    DEFAULT_FILE_STORAGE="storages.backends.s3boto3.S3Boto3Storage",
+)
+class DirectUploadTests(TestCase):
+    # Against moto's S3 stand-in; requests to the presigned URL are intercepted too.
+    video = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 1000
+
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket="lms-media")
+        self.client = APIClient()
+        self.course = create_course(sections=1, lectures=1)
+        self.lecture = self.course.lectures().get()
+
+    def issue(self, target, instance, filename, size, **data):
+        response = self.client.post("/api/v1/teacher/direct-upload/", {
+            "target": target, "object_id": instance.pk, "filename": filename, "size": size, **data,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def complete(self, token):
+        return self.client.post("/api/v1/teacher/direct-upload/complete/", {"token": token}, format="json")
+
+    def keys(self):
+        return [item["Key"] for item in self.s3.list_objects_v2(Bucket="lms-media").get("Contents", [])]
+
+    def test_presigned_post_pins_size_type_and_parameters(self):
+        upload = self.issue("lecture.file", self.lecture, "intro video.mp4", len(self.video))
+        fields = upload["fields"]
+        self.assertTrue(fields["key"].startswith("static/course-file/intro"))
+        self.assertEqual((fields["Content-Type"], fields["acl"], fields["Cache-Control"]), ("video/mp4", "public-read", "max-age=86400"))
+
+        policy = json.loads(base64.b64decode(fields["policy"]))
+        conditions = policy["conditions"]
+        self.assertIn(["content-length-range", len(self.video), len(self.video)], conditions)
+        for name in ("Content-Type", "acl", "Cache-Control"):
+            self.assertIn({name: fields[name]}, conditions)
+        self.assertIn({"key": fields["key"]}, conditions)
+
+    def test_rejects_wrong_content_type_for_images(self):
+        response = self.client.post("/api/v1/teacher/direct-upload/", {
+            "target": "course.image", "object_id": self.course.pk, "filename": "cover.mp4", "size": 5,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_lecture_completion_queues_media_jobs(self):
+        upload = self.issue("lecture.file", self.lecture, "intro.mp4", len(self.video))
+        self.assertEqual(self.complete(upload["token"]).status_code, 400)  # Nothing uploaded yet.
+
+        posted = requests.post(upload["url"], data=upload["fields"], files={"file": ("intro.mp4", self.video)})
+        self.assertLess(posted.status_code, 300)
+        response = self.complete(upload["token"])
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.lecture.refresh_from_db()
+        self.assertEqual(self.lecture.file.name, upload["fields"]["key"][len("static/"):])
+        self.assertEqual(self.lecture.media_status, "processing")
+        self.assertEqual(sorted(MediaJob.objects.values_list("kind", flat=True)), ["hls", "probe"])
+        # Completing again is a no-op.
+        self.assertEqual(self.complete(upload["token"]).status_code, 200)
+        self.assertEqual(MediaJob.objects.count(), 2)
+
+    def assertMismatchDeleted(self, body, content_type):
+        upload = self.issue("lecture.file", self.lecture, "intro.mp4", len(self.video))
+        key = upload["fields"]["key"]
+        self.s3.put_object(Bucket="lms-media", Key=key, Body=body, ContentType=content_type)
+
+        response = self.complete(upload["token"])
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(key, self.keys())
+        self.lecture.refresh_from_db()
+        self.assertFalse(self.lecture.file)
+
+    def test_size_mismatch_deletes_object(self):
+        self.assertMismatchDeleted(self.video + b"extra", "video/mp4")
+
+    def test_content_type_mismatch_deletes_object(self):
+        self.assertMismatchDeleted(self.video, "application/octet-stream")
+
+    def test_forged_token_rejected(self):
+        upload = self.issue("lecture.file", self.lecture, "intro.mp4", len(self.video))
+        payload = signing_payload(upload["token"])
+        payload["pk"] = self.course.pk
+        forged = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+        for token in (upload["token"][:-2] + "xx", forged + upload["token"][upload["token"].index(":"):]):
+            response = self.complete(token)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["message"], "Invalid or expired upload token.")
+
+    def test_expired_token_rejected(self):
+        upload = self.issue("lecture.file", self.lecture, "intro.mp4", len(self.video))
+        self.s3.put_object(Bucket="lms-media", Key=upload["fields"]["key"], Body=self.video, ContentType="video/mp4")
+        later = time.time() + settings.DIRECT_UPLOAD_EXPIRY + direct_uploads.COMPLETE_WITHIN + 60
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            response = self.complete(upload["token"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], "Invalid or expired upload token.")
+
+
+def signing_payload(token):
+    # The JSON in a django.core.signing token (not compressed: it is short).
+    data = token.split(":")[0]
+    return json.loads(base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)))
@@ -0,0 +1,133 @@
+"""
+Resumable chunked uploads of lecture files.
+
+A client creates a ChunkedUpload for a lecture with the file's name and
+size, PUTs the bytes in pieces (each with `Content-Range: bytes start-end/size`, or
+appended at the current offset without one), checks the offset with a GET
+after a dropped connection, and finalizes the upload onto a lecture.
+
+Chunks are copied from the request stream into a staging file in
+CHUNKED_UPLOAD_DIR a block at a time, so memory stays flat whatever the
+chunk or file size. On finalize, FileSystemStorage moves the staging file
+into place; other storages (S3) read it from disk. Every request of an
+upload must reach the same disk, so the views refuse chunked uploads unless
+CHUNKED_UPLOADS_ENABLED (off when SERVERLESS).
+"""
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from api.models import ChunkedUpload
+
+
+BLOCK_SIZE = 1024 * 1024
+
+# What clients are told to send per PUT.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadError(Exception):
+    """A chunk or finalize request that doesn't fit the upload's state."""
+
+
+class UploadConflict(UploadError):
+    """The chunk doesn't start at the upload's current offset."""
+
+
+def staging_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.upload_id}.part")
+
+
+class StagedFile(File):
+    # FileSystemStorage moves a file that has a temporary path instead of copying it.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def chunk_start(upload, content_range, length):
+    """Where a chunk of `length` bytes with this Content-Range header (or None) starts."""
+    if not content_range:
+        return upload.offset
+    match = CONTENT_RANGE_RE.match(content_range.strip())
+    if match is None:
+        raise UploadError(f"Malformed Content-Range: {content_range}")
+    start, end, total = match.groups()
+    start, end = int(start), int(end)
+    if total != "*" and int(total) != upload.size:
+        raise UploadError(f"Content-Range total {total} does not match the upload size {upload.size}.")
+    if end - start + 1 != length:
+        raise UploadError("Content-Range does not match Content-Length.")
+    return start
+
+
+def write_chunk(upload, stream, length, content_range=None):
+    """
+    Append `length` bytes from `stream` to the upload and return its new
+    offset. Bytes that arrive before the client disconnects are kept, so
+    the next chunk starts where this one stopped.
+    """
+    if upload.status != "uploading":
+        raise UploadError("This upload is already complete.")
+    start = chunk_start(upload, content_range, length)
+    if start != upload.offset:
+        raise UploadConflict(f"Expected a chunk at offset {upload.offset}, got {start}.")
+    if start + length > upload.size:
+        raise UploadError(f"The chunk ends past the declared size of {upload.size} bytes.")
+
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    written = 0
+    descriptor = os.open(staging_path(upload), os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        with os.fdopen(descriptor, "wb") as staging:
+            staging.seek(start)
+            staging.truncate()
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                staging.write(block)
+                written += len(block)
+    finally:
+        # Only advance if nobody else did meanwhile; a racing PUT of the
+        # same range wrote the same bytes.
+        if written and ChunkedUpload.objects.filter(pk=upload.pk, offset=start).update(offset=start + written):
+            upload.offset = start + written
+    if written < length:
+        raise UploadError(f"Connection closed after {written} of {length} bytes.")
+    return upload.offset
+
+
+def finalize(upload):
+    """Attach the finished upload to its lecture as the lecture's file, and return the lecture."""
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().select_related("variant_item").get(pk=upload.pk)
+        lecture = upload.variant_item
+        if lecture is None:
+            raise UploadError("The lecture for this upload no longer exists.")
+        if upload.status == "complete":
+            return lecture
+        if upload.offset != upload.size:
+            raise UploadConflict(f"Only {upload.offset} of {upload.size} bytes have been uploaded.")
+
+        path = staging_path(upload)
+        with StagedFile(open(path, "rb"), name=upload.filename) as staged:
+            # Goes through storage and queues the probe/HLS jobs (VariantItem.save).
+            lecture.file = staged
+            lecture.save()
+        if os.path.exists(path):
+            os.remove(path)
+
+        upload.status = "complete"
+        upload.save(update_fields=["status", "updated_at"])
+    return lecture
+
+
+def discard(upload):
+    if os.path.exists(staging_path(upload)):
+        os.remove(staging_path(upload))
+    upload.delete()
@@ -28,6 +28,7 @@ urlpatterns = [
     path('course/category/', api_views.CategoryListView.as_view()),
     path('course/course-list/', api_views.CourseListAPIView.as_view()),
     path('course/course-detail/<slug>/', api_views.CourseDetailAPIView.as_view()),
+    path('course/lecture-file/<int:lecture_id>/', api_views.LectureFileAPIView.as_view(), name='lecture-file'),
     path('cart/create/', api_views.CartAPIView.as_view()),
     path('cart/list/<cart_id>/', api_views.CartListAPIView.as_view()),
     path('cart/list/<cart_id>/<user_id>/', api_views.CartListAPIView.as_view()),
@@ -85,6 +86,7 @@ urlpatterns = [
     path('teacher/question-answer-list/<teacher_id>/', api_views.TeacherQuestionAnswerListAPIView.as_view()),
     path('teacher/course-create/', api_views.CourseCreateAPIView.as_view()),
     path('teacher/course-update/<teacher_id>/<course_id>/', api_views.CourseUpdateAPIView.as_view()),
+    path('teacher/course-update/<teacher_id>/<course_id>/curriculum/', api_views.CurriculumOperationsAPIView.as_view()),
     path('teacher/course/variant-delete/<variant_id>/<teacher_id>/<course_id>/', api_views.CourseVariantDeleteAPIView.as_view()),
     path('teacher/course/variant/item-delete/<variant_id>/<variant_item_id>/<teacher_id>/<course_id>/', api_views.CourseVariantItemDeleteAPIView.as_view()),
     path('teacher/course-detail/<course_id>/', api_views.TeacherCourseDetailAPIView.as_view()),
@@ -93,5 +95,10 @@ urlpatterns = [
     path('teacher/coupon-detail/<teacher_id>/<coupon_id>/', api_views.TeacherCouponDetailAPIView.as_view()),
     path('teacher/noti-list/<teacher_id>/', api_views.TeacherNotificationListAPIView.as_view()),
     path('teacher/noti-detail/<teacher_id>/<noti_id>/', api_views.TeacherNotificationDetailAPIView.as_view()),
+    path('teacher/lecture-upload/', api_views.LectureUploadCreateAPIView.as_view()),
+    path('teacher/lecture-upload/<uuid:upload_id>/', api_views.LectureUploadAPIView.as_view()),
+    path('teacher/lecture-upload/<uuid:upload_id>/finalize/', api_views.LectureUploadFinalizeAPIView.as_view()),
+    path('teacher/direct-upload/', api_views.DirectUploadAPIView.as_view()),
+    path('teacher/direct-upload/complete/', api_views.DirectUploadCompleteAPIView.as_view()),
 
 ]
\ No newline at end of file
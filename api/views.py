@@ -2,19 +2,24 @@ from django.shortcuts import redirect
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
-from django.db.models import Q, F, Count, Sum, Max
+from django.db.models import Q, F, Count, Sum, Max, Prefetch
 from django.db import transaction
 from django.contrib.auth.hashers import check_password
 from django.db.models.functions import ExtractMonth
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.http import Http404
 
 # Restframework
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import generics, viewsets
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.versioning import QueryParameterVersioning
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -22,45 +27,171 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from decimal import Decimal
 import json
 import random
-import stripe
-import requests
 from datetime import datetime, timedelta
-from distutils.util import strtobool
 
 # Serializers
 from api import serializer as api_serializers
+from api import blobs, direct_uploads, facets, search, streaming, uploads
+from api.cache import CachedResponseMixin, course_tag
+from api.curriculum import CurriculumError, apply_operations, create_curriculum, update_curriculum
+from api.pagination import SearchResultsPagination
+from api.parsers import nested_form_data
 
 # Models
-from api.models import Certificate, CompletedLesson, Country, EnrolledCourse, Note, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, Review, Notification, Coupon, Wishlist, Question_Answer, Question_Answer_Message
+from api.models import Certificate, CompletedLesson, Country, EnrolledCourse, Note, Teacher, Category, Course, Variant, VariantItem, Cart, CartOrder, CartOrderItem, Review, Notification, Coupon, Wishlist, Question_Answer, Question_Answer_Message, ChunkedUpload
 from userauths.models import Profile, User
 
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 PAYPAL_CLIENT_ID = settings.PAYPAL_CLIENT_ID
 PAYPAL_SECRET_ID = settings.PAYPAL_SECRET_ID
 
 
+# stripe and requests are imported on first use, not at startup: stripe alone
+# is most of a cold start and only the payment views need it.
+def get_stripe():
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+class WriteSerializerMixin:
+    # POST validates with the flat (depth 0) write serializer; every other
+    # method reads through the nested serializer_class.
+    write_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST' and self.write_serializer_class is not None:
+            return self.write_serializer_class
+        return super().get_serializer_class()
+
+
+class CurriculumInputMixin:
+    # The sections and lectures of the course create/update forms
+    # (`variants[0][items][1][title]` keys), parsed in one pass and validated.
+    def get_curriculum(self):
+        serializer = api_serializers.CurriculumInputSerializer(data=nested_form_data(self.request.data))
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('variants')
+
+
+class ExpandedQuerysetMixin:
+    # Prefetch what the serializer will read for this request's ?fields= /
+    # ?include= selection, and nothing more.
+    def expand_queryset(self, queryset):
+        select, prefetch = api_serializers.expansion_lookups(self.get_serializer())
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+
+
+class CourseDetailVersioning(QueryParameterVersioning):
+    default_version = '1'
+    allowed_versions = ('1', '2')
+
+class VersionedCourseDetailMixin:
+    # ?version=2 returns the normalized curriculum (CourseDetailSerializer).
+    versioning_class = CourseDetailVersioning
+
+    def get_serializer_class(self):
+        if self.request.version == '2':
+            return api_serializers.CourseDetailSerializer
+        return super().get_serializer_class()
+
+
 # Course API Views
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = api_serializers.CategorySerializer
     queryset = Category.objects.filter(active=True)
     permission_classes = [AllowAny]
+    cache_tags = ('categories',)
+    cursor_ordering = ('title', 'id')
+
+def course_listing_queryset(queryset):
+    # Everything CourseListSerializer reads, planned up front: one query for the
+    # courses (teacher and category joined) plus one per prefetch.
+    return (
+        queryset
+        .select_related('teacher', 'category')
+        .prefetch_related(
+            Prefetch('variant_set', queryset=Variant.objects.prefetch_related('variant_items')),
+            Prefetch('reviews', queryset=Review.objects.filter(active=True).select_related('user__profile'), to_attr='active_reviews'),
+        )
+    )
 
-class CourseListAPIView(generics.ListAPIView):
-    serializer_class = api_serializers.CourseSerializer
+COURSE_CARD_FIELDS = (
+    'id', 'course_id', 'slug', 'title', 'image', 'image_variants', 'price', 'level', 'language', 'featured', 'date',
+    'average_rating', 'rating_count', 'teacher_id', 'teacher__full_name', 'category__title', 'category__slug',
+)
+
+def course_card_queryset(queryset, *extra_fields):
+    # Only the columns a card shows, as dicts.
+    return queryset.values(*COURSE_CARD_FIELDS, *extra_fields)
+
+class CourseListAPIView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = api_serializers.CourseCardSerializer
     permission_classes = [AllowAny]
-    queryset = Course.objects.filter(platform_status="Published", teacher_course_status="Published")
+    cache_tags = ('courses',)
+
+    def get_candidates(self):
+        courses = Course.objects.filter(platform_status="Published", teacher_course_status="Published")
+        return facets.filter_price_range(courses, self.request.query_params)
+
+    def get_queryset(self):
+        filters = facets.parse_filters(self.request.query_params)
+        return course_card_queryset(facets.filter_courses(self.get_candidates(), filters))
 
-class CourseDetailAPIView(generics.RetrieveAPIView):
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = facets.facet_counts(self.get_candidates(), facets.parse_filters(request.query_params))
+        return response
+
+def course_version(request, slug):
+    # (id, updated_at) of the published course behind a detail URL. Looked up
+    # once per request: the validators and the cache tags both need it.
+    if not hasattr(request, '_course_version'):
+        request._course_version = Course.objects.filter(
+            slug=slug, platform_status="Published", teacher_course_status="Published"
+        ).values_list('id', 'updated_at').first()
+    return request._course_version
+
+def course_etag(request, slug):
+    version = course_version(request, slug)
+    return version and f'W/"course-{version[0]}-{version[1].timestamp()}"'
+
+def course_last_modified(request, slug):
+    version = course_version(request, slug)
+    return version and version[1]
+
+@method_decorator(condition(etag_func=course_etag, last_modified_func=course_last_modified), name='get')
+class CourseDetailAPIView(CachedResponseMixin, VersionedCourseDetailMixin, ExpandedQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = api_serializers.CourseSerializer
     permission_classes = [AllowAny]
 
+    def get_cache_tags(self):
+        version = course_version(self.request, self.kwargs['slug'])
+        return (course_tag(version[0]),) if version else ()
+
     def get_object(self):
         slug = self.kwargs['slug']
-        return Course.objects.get(slug=slug, platform_status="Published", teacher_course_status="Published")
+        return self.expand_queryset(Course.objects).get(slug=slug, platform_status="Published", teacher_course_status="Published")
 
-class CartAPIView(generics.ListCreateAPIView):
+class LectureFileAPIView(generics.GenericAPIView):
+    # Video players seek with Range requests; see api/streaming.py.
+    queryset = VariantItem.objects.all()
+    permission_classes = [AllowAny]
+    lookup_url_kwarg = 'lecture_id'
+
+    def perform_content_negotiation(self, request, force=False):
+        # The response is the file itself, whatever renderer Accept asks for.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        lecture = self.get_object()
+        if not lecture.file:
+            raise Http404
+        return streaming.file_response(request, lecture.file)
+
+class CartAPIView(WriteSerializerMixin, generics.ListCreateAPIView):
     serializer_class = api_serializers.CartSerializer
+    write_serializer_class = api_serializers.CartWriteSerializer
     queryset = Cart.objects.all()
     permission_classes = [AllowAny]
 
@@ -218,8 +349,9 @@ class CartItemDeleteAPIView(generics.DestroyAPIView):
         cart = Cart.objects.get(cart_id=cart_id, id=item_id)
         return cart
     
-class CreateOrderAPIView(generics.CreateAPIView):
+class CreateOrderAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.CartOrderSerializer
+    write_serializer_class = api_serializers.CartOrderWriteSerializer
     queryset = CartOrder.objects.all()
     permission_classes = (AllowAny,)
 
@@ -280,17 +412,18 @@ class CreateOrderAPIView(generics.CreateAPIView):
 
         return Response( {"message": "Order Created Successfully", 'order_oid':order.oid}, status=status.HTTP_201_CREATED)
 
-class CheckoutAPIView(generics.RetrieveAPIView):
+class CheckoutAPIView(ExpandedQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = api_serializers.CartOrderSerializer
     permission_classes = [AllowAny]
     lookup_field = 'order_oid'  
 
     def get_object(self):
         order_oid = self.kwargs['order_oid']
-        return CartOrder.objects.get(oid=order_oid)
+        return self.expand_queryset(CartOrder.objects).get(oid=order_oid)
     
-class CouponApplyAPIView(generics.CreateAPIView):
+class CouponApplyAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.CartOrderSerializer
+    write_serializer_class = api_serializers.CartOrderWriteSerializer
     permission_classes = [AllowAny]
 
     def create(self, request, *args, **kwargs):
@@ -331,8 +464,9 @@ class CouponApplyAPIView(generics.CreateAPIView):
         else:
             return Response( {"message": "Coupon Does Not Exists"}, status=status.HTTP_404_NOT_FOUND)
 
-class StripeCheckoutAPIView(generics.CreateAPIView):
+class StripeCheckoutAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.CartOrderSerializer
+    write_serializer_class = api_serializers.CartOrderWriteSerializer
 
     def create(self, request, *args, **kwargs):
         order_oid = self.kwargs['order_oid']
@@ -341,7 +475,7 @@ class StripeCheckoutAPIView(generics.CreateAPIView):
         if not order:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
-
+        stripe = get_stripe()
         try:
             checkout_session = stripe.checkout.Session.create(
                 customer_email=order.email,
@@ -374,6 +508,8 @@ class StripeCheckoutAPIView(generics.CreateAPIView):
 
 def get_access_token(client_id, secret_key):
     # Function to get access token from PayPal API
+    import requests
+
     token_url = 'https://api.sandbox.paypal.com/v1/oauth2/token'
     data = {'grant_type': 'client_credentials'}
     auth = (client_id, secret_key)
@@ -385,8 +521,9 @@ def get_access_token(client_id, secret_key):
     else:
         raise Exception(f'Failed to get access token from PayPal. Status code: {response.status_code}') 
 
-class PaymentSuccessAPIView(generics.CreateAPIView):
+class PaymentSuccessAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.CartOrderSerializer
+    write_serializer_class = api_serializers.CartOrderWriteSerializer
     queryset = CartOrder.objects.all()
     
     def create(self, request, *args, **kwargs):
@@ -409,6 +546,8 @@ class PaymentSuccessAPIView(generics.CreateAPIView):
                 'Content-Type': 'application/json',
                 'Authorization': f'Bearer {get_access_token(PAYPAL_CLIENT_ID, PAYPAL_SECRET_ID)}',
             }
+            import requests
+
             response = requests.get(paypal_api_url, headers=headers)
             print("response ========", response)
             if response.status_code == 200:
@@ -439,7 +578,7 @@ class PaymentSuccessAPIView(generics.CreateAPIView):
 
         # Process Stripe Payment
         if session_id != "null":
-            session = stripe.checkout.Session.retrieve(session_id)
+            session = get_stripe().checkout.Session.retrieve(session_id)
 
             if session.payment_status == "paid":
                 if order.payment_status == "processing":
@@ -466,13 +605,34 @@ class PaymentSuccessAPIView(generics.CreateAPIView):
             session = None
             return Response( {"message": "An Error Occured 2"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class SearchProductsAPIView(generics.ListAPIView):
-    serializer_class = api_serializers.CourseSerializer
+class SearchProductsAPIView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = api_serializers.CourseSearchResultSerializer
     permission_classes = [AllowAny]
+    pagination_class = SearchResultsPagination
+    cache_tags = ('courses',)
 
     def get_queryset(self):
-        query = self.request.GET.get('query')
-        return Course.objects.filter(title__icontains=query, platform_status="Published", teacher_course_status="Published")
+        courses = Course.objects.filter(platform_status="Published", teacher_course_status="Published")
+        return facets.filter_price_range(courses, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        query = request.GET.get('query', '')
+        filters = facets.parse_filters(request.query_params)
+
+        # The facet filters go into the ranking statement, so the cap applies
+        # to the filtered results; the facets count every match of the query.
+        courses = self.get_queryset()
+        ranked = search.search_courses(facets.filter_courses(courses, filters), query)
+        page = list(self.paginate_queryset(ranked))
+
+        cards = {row['id']: row for row in course_card_queryset(Course.objects.filter(id__in=page))}
+        highlights = search.highlight_courses(page, query)
+        rows = [dict(cards[course_id], highlight=highlights.get(course_id)) for course_id in page]
+
+        serializer = self.get_serializer(rows, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['facets'] = facets.facet_counts(search.matching(courses, query), filters)
+        return response
        
 
 
@@ -511,7 +671,7 @@ class StudentSummaryAPIView(generics.ListAPIView):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
-class StudentCourseListAPIView(generics.ListAPIView):
+class StudentCourseListAPIView(ExpandedQuerysetMixin, generics.ListAPIView):
     serializer_class = api_serializers.EnrolledCourseSerializer
         # permission_classes = [IsAuthenticated] # student isauthed
     permission_classes = [AllowAny]
@@ -520,9 +680,26 @@ class StudentCourseListAPIView(generics.ListAPIView):
         user_id = self.kwargs['user_id']
 
         user = User.objects.get(id=user_id)
-        return EnrolledCourse.objects.filter(user=user)
-
-class StudentCourseDetailAPIView(generics.RetrieveAPIView):
+        return self.expand_queryset(EnrolledCourse.objects.filter(user=user))
+
+def enrollment_version(request, user_id, enrollment_id):
+    # The student's course page changes with the enrollment (their notes,
+    # lessons and review) or with the course itself.
+    if not hasattr(request, '_enrollment_version'):
+        row = EnrolledCourse.objects.filter(user_id=user_id, enrollment_id=enrollment_id).values_list('id', 'updated_at', 'course__updated_at').first()
+        request._enrollment_version = row and (row[0], max(row[1], row[2]))
+    return request._enrollment_version
+
+def enrollment_etag(request, user_id, enrollment_id):
+    version = enrollment_version(request, user_id, enrollment_id)
+    return version and f'W/"enrollment-{version[0]}-{version[1].timestamp()}"'
+
+def enrollment_last_modified(request, user_id, enrollment_id):
+    version = enrollment_version(request, user_id, enrollment_id)
+    return version and version[1]
+
+@method_decorator(condition(etag_func=enrollment_etag, last_modified_func=enrollment_last_modified), name='get')
+class StudentCourseDetailAPIView(ExpandedQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = api_serializers.EnrolledCourseSerializer
     permission_classes = [AllowAny]
     # permission_classes = [IsAuthenticated] # student isauthed
@@ -533,10 +710,11 @@ class StudentCourseDetailAPIView(generics.RetrieveAPIView):
         enrollment_id = self.kwargs['enrollment_id']
         
         user = User.objects.get(id=user_id)
-        return EnrolledCourse.objects.get(user=user, enrollment_id=enrollment_id)
+        return self.expand_queryset(EnrolledCourse.objects).get(user=user, enrollment_id=enrollment_id)
     
-class StudentCourseCompletedCreateAPIView(generics.CreateAPIView):
+class StudentCourseCompletedCreateAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.CompletedLessonSerializer
+    write_serializer_class = api_serializers.CompletedLessonWriteSerializer
     permission_classes = [AllowAny]
     # permission_classes = [IsAuthenticated] # student isauthed
     
@@ -557,8 +735,9 @@ class StudentCourseCompletedCreateAPIView(generics.CreateAPIView):
             CompletedLesson.objects.create(user=user, course=course, variant_item=variant_item)
             return Response({"message": "Course Marked As Completed"})
 
-class StudentNoteCreateAPIView(generics.ListCreateAPIView):
+class StudentNoteCreateAPIView(WriteSerializerMixin, generics.ListCreateAPIView):
     serializer_class = api_serializers.NoteSerializer
+    write_serializer_class = api_serializers.NoteWriteSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -600,8 +779,9 @@ class StudentNoteDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         note = Note.objects.get(user=user, course=enrolled.course, id=note_id)
         return note
 
-class StudentRateCourseAPIView(generics.CreateAPIView):
+class StudentRateCourseAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.ReviewSerializer
+    write_serializer_class = api_serializers.ReviewWriteSerializer
     permission_classes = [AllowAny]
 
     def create(self, request, *args, **kwargs):
@@ -648,15 +828,17 @@ class QuizResultAPIView(generics.RetrieveAPIView):
     pass
 
 class StudentWishListListCreateAPIView(generics.ListCreateAPIView):
-    serializer_class = api_serializers.WishlistSerializer
+    serializer_class = api_serializers.WishlistCardSerializer
         # permission_classes = [IsAuthenticated] # student isauthed
     permission_classes = [AllowAny]
+    cursor_ordering = ('-wishlist_id',)
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
 
         user = User.objects.get(id=user_id)
-        return Wishlist.objects.filter(user=user)
+        courses = Course.objects.filter(wishlist__user=user).annotate(wishlist_id=F('wishlist__id'), wishlist_user_id=F('wishlist__user'))
+        return course_card_queryset(courses, 'wishlist_id', 'wishlist_user_id')
     
     def create(self, request, *args, **kwargs):
         payload = request.data
@@ -697,8 +879,9 @@ class QuestionAnswerDetailAPIView(generics.ListAPIView):
         course = Course.objects.get(id=course_id)
         return Question_Answer.objects.get(id=qa_id)
     
-class QuestionAnswerCreateAPIView(generics.CreateAPIView):
+class QuestionAnswerCreateAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.Question_AnswerSerializer
+    write_serializer_class = api_serializers.Question_AnswerWriteSerializer
         # permission_classes = [IsAuthenticated] # student isauthed
     permission_classes = [AllowAny]
 
@@ -727,8 +910,9 @@ class QuestionAnswerCreateAPIView(generics.CreateAPIView):
 
         return Response({"message": "Group Conversation Started"})
 
-class QuestionAnswerMessageSendAPIView(generics.CreateAPIView):
+class QuestionAnswerMessageSendAPIView(WriteSerializerMixin, generics.CreateAPIView):
     serializer_class = api_serializers.Question_AnswerSerializer
+    write_serializer_class = api_serializers.Question_AnswerWriteSerializer
         # permission_classes = [IsAuthenticated] # student isauthed
     permission_classes = [AllowAny]
 
@@ -812,14 +996,14 @@ class TeacherSummaryAPIView(generics.ListAPIView):
         return Response(serializer.data)
     
 class TeacherCourseListAPIView(generics.ListAPIView):
-    serializer_class = api_serializers.CourseSerializer
+    serializer_class = api_serializers.CourseListSerializer
     permission_classes = [AllowAny]
     #permission_classes = [IsAuthenticated] # teacher isauthed
 
     def get_queryset(self):
         teacher_id = self.kwargs['teacher_id']
         teacher = Teacher.objects.get(id=teacher_id)
-        return Course.objects.filter(teacher=teacher)
+        return course_listing_queryset(Course.objects.filter(teacher=teacher))
 
 class TeacherReviewListAPIView(generics.ListAPIView):
     serializer_class = api_serializers.ReviewSerializer
@@ -991,63 +1175,24 @@ class TeacherQuestionAnswerListAPIView(generics.ListAPIView):
 
         return Question_Answer.objects.filter(course__teacher=teacher)
     
-class CourseCreateAPIView(generics.CreateAPIView):
+class CourseCreateAPIView(CurriculumInputMixin, WriteSerializerMixin, generics.CreateAPIView):
     queryset = Course.objects.all()
     serializer_class = api_serializers.CourseSerializer
+    write_serializer_class = api_serializers.CourseWriteSerializer
 
     def perform_create(self, serializer):
         serializer.is_valid(raise_exception=True)
-        course_instance = serializer.save()
-        print(self.request.data)
-
-        variants_data = []
+        curriculum = self.get_curriculum()
+        with blobs.atomic():
+            course_instance = serializer.save()
+            create_curriculum(course_instance, curriculum or [])
 
-        for key, value in self.request.data.items():
-            if key.startswith('variants') and '[variant_title]' in key:  # Check for the variant title field
-                index = key.split('[')[1].split(']')[0]
-                title = value
-                
-                variant_data = {'title': title}
-                item_data_list = []
-                current_item = {}
-
-                for item_key, item_value in self.request.data.items():
-                    if f'variants[{index}][items]' in item_key:
-                        field_name = item_key.split('[')[-1].split(']')[0]
-                        if field_name == 'title':
-                            if current_item:
-                                item_data_list.append(current_item)
-                            current_item = {}
-                        current_item.update({field_name: item_value})
-
-                if current_item:
-                    item_data_list.append(current_item)
-
-                variants_data.append({'variant_data': variant_data, 'variant_item_data': item_data_list})
-            
-        for data_entry in variants_data:
-            variant = Variant.objects.create( title=data_entry['variant_data']['title'], course=course_instance, )
-
-            for item_data in data_entry['variant_item_data']:
-                print("item_data ======", item_data)
-
-                preview_value = item_data.get('preview')
-                preview = bool(strtobool(str(preview_value))) if preview_value is not None else False
-
-                VariantItem.objects.create(
-                    variant=variant,
-                    title=item_data.get('title'),
-                    description=item_data.get('description'),
-                    file=item_data.get('file'),
-                    preview=preview,
-                )
-        
     def save_nested_data(self, course_instance, serializer_class, data):
         serializer = serializer_class(data=data, many=True, context={'course_instance': course_instance})
         serializer.is_valid(raise_exception=True)
         serializer.save(course=course_instance)
 
-class CourseUpdateAPIView(generics.RetrieveUpdateAPIView):
+class CourseUpdateAPIView(CurriculumInputMixin, generics.RetrieveUpdateAPIView):
     queryset = Course.objects.all()
     serializer_class = api_serializers.CourseSerializer
 
@@ -1079,125 +1224,43 @@ class CourseUpdateAPIView(generics.RetrieveUpdateAPIView):
             category = Category.objects.get(id=request.data['category'])
             course.category = category
 
-        self.perform_update(serializer)
-        self.update_variants(course, request.data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        curriculum = self.get_curriculum()
+        with blobs.atomic():
+            self.perform_update(serializer)
+            changes = update_curriculum(course, curriculum) if curriculum is not None else None
+        return Response({**serializer.data, 'curriculum_changes': changes}, status=status.HTTP_200_OK)
 
         
-    def update_variants(self, course, request_data):
-        for key, value in request_data.items():
-            
-            # print("key =========", key)
-            # print("value =========", value)
-
-            if key.startswith('variants') and '[variant_title]' in key:  # Check for the variant title field
-                index = key.split('[')[1].split(']')[0]
-                title = value
-
-                id_key = f'variants[{index}][variant_id]'
-                variant_id = request_data.get(id_key)
-
-                variant_data = {'title': title}
-                item_data_list = []
-                current_item = {}
-
-                for item_key, item_value in request_data.items():
-                    if f'variants[{index}][items]' in item_key:
-                        field_name = item_key.split('[')[-1].split(']')[0]
-                        print("field_name ========", item_value)
-                        if field_name == 'title':
-                            if current_item:
-                                item_data_list.append(current_item)
-                            current_item = {}
-                        current_item.update({field_name: item_value})
-                        print("current_item =====", current_item)
-                if current_item:
-                    item_data_list.append(current_item)
-
-                # Find the existing variant by ID
-                existing_variant = course.variant_set.filter(id=variant_id).first()
-
-
-                if existing_variant:
-                    print("item_data_list existing_variant ==========", item_data_list)
-
-                    existing_variant.title = title
-                    existing_variant.save()
-
-                    # Update or create variant items
-                    for item_data in item_data_list[1:]:
-                        preview_value = item_data.get('preview')
-                        preview = bool(strtobool(str(preview_value))) if preview_value is not None else False
-
-                        variant_item = VariantItem.objects.filter(variant_item_id=item_data.get("variant_item_id")).first()
-
-                        if not str(item_data.get("file")).startswith("http://"):
-                            if item_data.get("file") != "null":
-                                file = item_data.get("file")
-                            else:
-                                file = None
-
-                            title = item_data.get('title')
-                            description = item_data.get('description')
-
-                            if variant_item:
-                                variant_item.title = title
-                                variant_item.description = description
-                                variant_item.file = file
-                                variant_item.preview = preview
-                            else:
-                                variant_item = VariantItem.objects.create(
-                                    variant=existing_variant,
-                                    title=title,
-                                    description=description,
-                                    file=file,
-                                    preview=preview,
-                                )
-                        else:
-                            title = item_data.get('title')
-                            description = item_data.get('description')
-
-                            if variant_item:
-                                variant_item.title = title
-                                variant_item.description = description
-                                variant_item.preview = preview
-                            else:
-                                variant_item = VariantItem.objects.create(
-                                    variant=existing_variant,
-                                    title=title,
-                                    description=description,
-                                    preview=preview,
-                                )
-
-                        variant_item.save()
-                else:
-
-                    new_variant = Variant.objects.create(
-                        course=course,
-                        title=title,
-                    )
-                    print("item_data_list NOT existing_variant ==========", item_data_list)
-                    print("new_variant ==========", new_variant)
-
-                    # Create new variant items
-                    for item_data in item_data_list:
-                        print("item_data ==========", item_data)
-                        preview_value = item_data.get('preview')
-                        preview = bool(strtobool(str(preview_value))) if preview_value is not None else False
-
-                        VariantItem.objects.create(
-                            variant=new_variant,
-                            title=item_data.get('title'),
-                            description=item_data.get("description"),
-                            file=item_data.get("file"),
-                            preview=preview,
-                        )
-
     def save_nested_data(self, course_instance, serializer_class, data):
         serializer = serializer_class(data=data, many=True, context={'course_instance': course_instance})
         serializer.is_valid(raise_exception=True)
         serializer.save(course=course_instance)
 
+class CurriculumOperationsAPIView(generics.GenericAPIView):
+    # PATCH a list of insert/move/rename/delete edits to the sections and
+    # lectures; see api.curriculum.apply_operations.
+    serializer_class = api_serializers.CurriculumOperationsSerializer
+    permission_classes = [AllowAny]
+
+    def get_object(self):
+        teacher = Teacher.objects.get(id=self.kwargs['teacher_id'])
+        return Course.objects.get(teacher=teacher, course_id=self.kwargs['course_id'])
+
+    def patch(self, request, *args, **kwargs):
+        course = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                changes = apply_operations(course, serializer.validated_data['operations'])
+        except CurriculumError as e:
+            return Response({"operations": {e.index: [str(e)]}}, status=status.HTTP_400_BAD_REQUEST)
+
+        sections = Variant.objects.filter(course=course).prefetch_related('variant_items')
+        data = api_serializers.CurriculumSectionSerializer(sections, many=True, context=self.get_serializer_context()).data
+        return Response({'curriculum': data, 'curriculum_changes': changes})
+
+
 class CourseVariantDeleteAPIView(generics.DestroyAPIView):
     serializer_class = api_serializers.VariantSerializer
     permission_classes = [AllowAny]
@@ -1230,13 +1293,13 @@ class CourseVariantItemDeleteAPIView(generics.DestroyAPIView):
         return VariantItem.objects.get(variant=variant, variant_item_id=variant_item_id)
 
 
-class TeacherCourseDetailAPIView(generics.RetrieveAPIView):
+class TeacherCourseDetailAPIView(VersionedCourseDetailMixin, ExpandedQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = api_serializers.CourseSerializer
     permission_classes = [AllowAny]
 
     def get_object(self):
         course_id = self.kwargs['course_id']
-        return Course.objects.get(course_id=course_id)
+        return self.expand_queryset(Course.objects).get(course_id=course_id)
 
 class TeacherCourseDeleteAPIView(generics.DestroyAPIView):
     serializer_class = api_serializers.CourseSerializer
@@ -1247,8 +1310,9 @@ class TeacherCourseDeleteAPIView(generics.DestroyAPIView):
         return Course.objects.get(course_id=course_id)
 
 
-class TeacherCouponListAPIView(generics.ListCreateAPIView):
+class TeacherCouponListAPIView(WriteSerializerMixin, generics.ListCreateAPIView):
     serializer_class = api_serializers.CouponSerializer
+    write_serializer_class = api_serializers.CouponWriteSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -1267,8 +1331,9 @@ class TeacherCouponDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         return Coupon.objects.get(teacher=teacher, id=coupon_id)
 
 
-class TeacherNotificationListAPIView(generics.ListCreateAPIView):
+class TeacherNotificationListAPIView(WriteSerializerMixin, generics.ListCreateAPIView):
     serializer_class = api_serializers.NotificationSerializer
+    write_serializer_class = api_serializers.NotificationWriteSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -1286,4 +1351,115 @@ class TeacherNotificationDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         teacher = Teacher.objects.get(id=teacher_id)
         return Notification.objects.get(teacher=teacher, id=noti_id)
 
-    
\ No newline at end of file
+    
+
+
+class ChunkedUploadsDisabled(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_code = 'chunked_uploads_disabled'
+
+
+class ChunkedUploadsEnabledMixin:
+    # The chunks are staged on local disk (CHUNKED_UPLOAD_DIR), which
+    # serverless instances don't share.
+    def initial(self, request, *args, **kwargs):
+        if not settings.CHUNKED_UPLOADS_ENABLED:
+            raise ChunkedUploadsDisabled({"message": "Chunked uploads are not available here; use teacher/direct-upload/."})
+        super().initial(request, *args, **kwargs)
+
+
+class LectureUploadCreateAPIView(ChunkedUploadsEnabledMixin, generics.CreateAPIView):
+    # Large lecture files go up in chunks instead of inside the course form; see api/uploads.py.
+    serializer_class = api_serializers.ChunkedUploadSerializer
+    queryset = ChunkedUpload.objects.all()
+    permission_classes = [AllowAny]
+
+    def perform_create(self, serializer):
+        user = self.request.user if self.request.user.is_authenticated else None
+        serializer.save(user=user)
+
+
+class LectureUploadAPIView(ChunkedUploadsEnabledMixin, generics.RetrieveDestroyAPIView):
+    # GET: how far the upload got. PUT: the next chunk as the raw body. DELETE: give up.
+    serializer_class = api_serializers.ChunkedUploadSerializer
+    queryset = ChunkedUpload.objects.all()
+    permission_classes = [AllowAny]
+    lookup_field = 'upload_id'
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length < 1:
+            return Response({"message": "Send the chunk as the request body with a Content-Length."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # The raw stream, never request.data: nothing is buffered or parsed.
+            uploads.write_chunk(upload, request.stream, length, request.META.get('HTTP_CONTENT_RANGE'))
+        except uploads.UploadConflict as e:
+            return Response({"message": str(e), "offset": upload.offset}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadError as e:
+            return Response({"message": str(e), "offset": upload.offset}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+
+
+class LectureUploadFinalizeAPIView(ChunkedUploadsEnabledMixin, generics.GenericAPIView):
+    serializer_class = api_serializers.VariantItemSerializer
+    queryset = ChunkedUpload.objects.all()
+    permission_classes = [AllowAny]
+    lookup_field = 'upload_id'
+
+    def post(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            lecture = uploads.finalize(upload)
+        except uploads.UploadConflict as e:
+            return Response({"message": str(e), "offset": upload.offset}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(lecture).data)
+
+
+class DirectUploadAPIView(generics.GenericAPIView):
+    # With S3, the browser uploads straight to the bucket; see api/direct_uploads.py.
+    serializer_class = api_serializers.DirectUploadSerializer
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        model = direct_uploads.TARGETS[data['target']][0]
+        instance = model.objects.filter(pk=data['object_id']).first()
+        if instance is None:
+            raise Http404
+        try:
+            upload = direct_uploads.issue(data['target'], instance, data['filename'], data['size'], data.get('content_type'))
+        except direct_uploads.DirectUploadError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+
+class DirectUploadCompleteAPIView(generics.GenericAPIView):
+    serializer_class = api_serializers.DirectUploadCompleteSerializer
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            instance = direct_uploads.complete(serializer.validated_data['token'])
+        except direct_uploads.DirectUploadError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if isinstance(instance, VariantItem):
+            data = api_serializers.VariantItemSerializer(instance, context=self.get_serializer_context()).data
+        else:
+            data = api_serializers.CourseSerializer(instance, context=self.get_serializer_context()).data
+        return Response(data)
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for serverless deployments (Vercel, see vercel.json).
+
+Same application as backend/wsgi.py, but with SERVERLESS set so settings
+leave out the admin and swagger docs unless ADMIN_ENABLED / API_DOCS_ENABLED
+ask for them.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('SERVERLESS', '1')
+
+application = get_wsgi_application()
+
+app = application
@@ -34,6 +34,15 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["*"]
 
+# Serverless instances (backend/serverless.py) serve the API only, so every
+# cold start skips loading the admin, its editor uploads and the swagger docs.
+# Either can be turned back on with ADMIN_ENABLED / API_DOCS_ENABLED.
+SERVERLESS = env.bool("SERVERLESS", False)
+ADMIN_ENABLED = env.bool("ADMIN_ENABLED", not SERVERLESS)
+API_DOCS_ENABLED = env.bool("API_DOCS_ENABLED", not SERVERLESS)
+# api/tests.py (and `manage.py check_startup`) fail when django.setup() + URLconf take longer.
+STARTUP_BUDGET_MS = env.int("STARTUP_BUDGET_MS", 1200)
+
 
 # Application definition
 
@@ -65,6 +74,11 @@ INSTALLED_APPS = [
 
 ]
 
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ('jazzmin', 'django.contrib.admin')]
+if not API_DOCS_ENABLED:
+    INSTALLED_APPS.remove('drf_yasg')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     # Add CORSHeader Below
@@ -156,9 +170,9 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
-USE_S3 = env("USE_S3")
+USE_S3 = env.bool("USE_S3")
 
-if USE_S3 == True:
+if USE_S3:
     AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY = env("AWS_SECRET_ACCESS_KEY")
     AWS_STORAGE_BUCKET_NAME = env("AWS_STORAGE_BUCKET_NAME")
@@ -181,6 +195,37 @@ else:
     MEDIA_URL = 'media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Lecture files (api/streaming.py) are handed to the web server when it is
+# set up for it: an nginx `internal` location aliased to MEDIA_ROOT (e.g.
+# "/protected-media/"), or Apache mod_xsendfile / lighttpd.
+MEDIA_X_ACCEL_REDIRECT = env("MEDIA_X_ACCEL_REDIRECT", None)
+MEDIA_X_SENDFILE = env.bool("MEDIA_X_SENDFILE", False)
+
+# Resumable lecture uploads (api/uploads.py) are assembled here before
+# being handed to storage. Keep it on the same filesystem as MEDIA_ROOT so
+# finishing an upload is a rename, and shared if there are several servers.
+CHUNKED_UPLOAD_DIR = env("CHUNKED_UPLOAD_DIR", str(BASE_DIR / "chunked-uploads"))
+# Serverless instances share no disk, so the chunks of one upload would land
+# on different machines; there the client uploads straight to S3 instead
+# (teacher/direct-upload/).
+CHUNKED_UPLOADS_ENABLED = env.bool("CHUNKED_UPLOADS_ENABLED", not SERVERLESS)
+CHUNKED_UPLOAD_MAX_SIZE = env.int("CHUNKED_UPLOAD_MAX_SIZE", 20 * 1024 ** 3)
+
+# Uploads are hashed as they arrive so identical files are stored once
+# (api/blobs.py). Same behaviour as Django's default handlers otherwise.
+FILE_UPLOAD_HANDLERS = [
+    "api.blobs.HashingMemoryFileUploadHandler",
+    "api.blobs.HashingTemporaryFileUploadHandler",
+]
+
+# The course forms send five or so fields per lecture
+# (`variants[i][items][j][title]`, ...); Django's default of 1000 stops at
+# about 200 lectures.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = env.int("DATA_UPLOAD_MAX_NUMBER_FIELDS", 10000)
+
+# Seconds a presigned S3 upload URL (api/direct_uploads.py) stays valid.
+DIRECT_UPLOAD_EXPIRY = env.int("DIRECT_UPLOAD_EXPIRY", 60 * 60)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 AUTH_USER_MODEL = 'userauths.User'
@@ -219,6 +264,39 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 
+# Local memory by default; set REDIS_URL to share the cache (and its
+# invalidations) between processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lms-backend',
+    }
+}
+if env("REDIS_URL", None):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env("REDIS_URL"),
+    }
+
+# Public catalog responses (see api/cache.py).
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.DateCursorPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=50),
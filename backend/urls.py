@@ -14,43 +14,49 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="LMS Backend APIs",
-        default_version="v1",
-        description="This is the documentation for the backend API",
-        terms_of_service="http://mywbsite.com/policies/",
-        contact=openapi.Contact(email="desphixs@gmail.com"),
-        license=openapi.License(name="BSD Licence"),
-    ),
-    public=True,
-    permission_classes = (permissions.AllowAny, )
-)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-
-    # Documentation
-    path("", schema_view.with_ui('swagger', cache_timeout=0), name="schema-swagger-ui"),
-
     # API Routes
     path("api/v1/", include("api.urls")),
-
-    # Ckeditor 5
-    path("ckeditor5/", include('django_ckeditor_5.urls')),
-
 ]
 
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+
+        # Ckeditor 5
+        path("ckeditor5/", include('django_ckeditor_5.urls')),
+    ]
+
+if settings.API_DOCS_ENABLED:
+    from rest_framework import permissions
+    from drf_yasg.views import get_schema_view
+    from drf_yasg import openapi
+
+    schema_view = get_schema_view(
+        openapi.Info(
+            title="LMS Backend APIs",
+            default_version="v1",
+            description="This is the documentation for the backend API",
+            terms_of_service="http://mywbsite.com/policies/",
+            contact=openapi.Contact(email="desphixs@gmail.com"),
+            license=openapi.License(name="BSD Licence"),
+        ),
+        public=True,
+        permission_classes = (permissions.AllowAny, )
+    )
+
+    urlpatterns += [
+        # Documentation
+        path("", schema_view.with_ui('swagger', cache_timeout=0), name="schema-swagger-ui"),
+    ]
+
 
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,6 +5,8 @@ from django.utils.html import mark_safe
 
 from shortuuid.django_fields import ShortUUIDField
 
+from api.images import thumbnail_name
+
 class User(AbstractUser):
     username = models.CharField(unique=True, max_length=100)
     email = models.EmailField(unique=True) 
@@ -30,6 +32,8 @@ class User(AbstractUser):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.FileField(upload_to="image", default="default/default-user.jpg", null=True, blank=True)
+    # Resized copies of `image`, written by the media worker (api/media.py).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     full_name = models.CharField(max_length=100, null=True, blank=True)
     about = models.TextField(null=True, blank=True)
     country = models.CharField(max_length=100, null=True, blank=True)
@@ -48,7 +52,7 @@ class Profile(models.Model):
         super(Profile, self).save(*args, **kwargs)
 
     def thumbnail(self):
-        return mark_safe('<img src="/media/%s" width="50" height="50" object-fit:"cover" style="border-radius: 30px; object-fit: cover;" />' % (self.image))
+        return mark_safe('<img src="/media/%s" width="50" height="50" object-fit:"cover" style="border-radius: 30px; object-fit: cover;" />' % (thumbnail_name(self)))
     
 
 def create_user_profile(sender, instance, created, **kwargs):